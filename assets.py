@@ -0,0 +1,88 @@
+import pygame
+
+
+class TextureAtlas:
+    '''
+    one big surface that scaled images get packed into, shelf by shelf;
+    every image is handed out as a subsurface sharing the atlas pixels
+    '''
+    def __init__(self, size=(2048, 2048)):
+        self.width, self.height = size
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self._x = 0
+        self._y = 0
+        self._shelf_height = 0
+
+    def add(self, img):
+        ''' copy @img into the atlas, None if it doesn't fit anymore '''
+        w, h = img.get_size()
+        if w > self.width or h > self.height:
+            return None
+
+        if self._x + w > self.width:
+            # start a new shelf
+            self._x = 0
+            self._y += self._shelf_height
+            self._shelf_height = 0
+        if self._y + h > self.height:
+            return None
+
+        rect = pygame.Rect(self._x, self._y, w, h)
+        self.surface.blit(img, rect)
+        self._x += w
+        self._shelf_height = max(self._shelf_height, h)
+        return self.surface.subsurface(rect)
+
+
+class AssetCache:
+    '''
+    decodes and scales each image once per size; failed loads are
+    cached too, so a missing file only costs one disk lookup
+    '''
+    def __init__(self, atlas_size=(2048, 2048)):
+        self.atlas_size = atlas_size
+        self.atlases = []
+        self._images = {}  # (path, size) -> Surface or None
+
+    def image(self, path, size):
+        key = (path, tuple(size))
+        if key in self._images:
+            return self._images[key]
+
+        try:
+            img = pygame.image.load(path)
+            img = pygame.transform.scale(img, size)
+        except Exception as e:
+            print("Error loading img: ", e)
+            img = None
+
+        if img is not None:
+            img = self._pack(img)
+        self._images[key] = img
+        return img
+
+    def _pack(self, img):
+        if self.atlases:
+            packed = self.atlases[-1].add(img)
+            if packed is not None:
+                return packed
+
+        atlas = TextureAtlas(self.atlas_size)
+        packed = atlas.add(img)
+        if packed is None:
+            return img  # bigger than a whole atlas page, keep it as is
+        self.atlases.append(atlas)
+        return packed
+
+
+_cache = None
+
+def get_asset_cache():
+    ''' the process-wide AssetCache '''
+    global _cache
+    if _cache is None:
+        _cache = AssetCache()
+    return _cache
+
+def load_image(path, size):
+    return get_asset_cache().image(path, size)
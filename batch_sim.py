@@ -0,0 +1,310 @@
+'''
+lockstep batched fight simulator
+
+advances N copies of the same matchup at once on a fixed time step,
+with a batch dimension over every piece of unit state (hp, mana,
+shield, position, target, attack timer), so a whole batch costs about
+as many NumPy calls per step as a single fight has units
+
+it follows the rules in champions.py for
+    - targeting: nearest living enemy by current positions, kept until
+      it dies, ties by id; picking a new target mid-swing doesn't
+      restart the swing
+    - auto attacks: a 0.5/atspd wind-up, then a unit in range hits and
+      swings again every 1/atspd; one out of range takes a step toward
+      its target instead and looks again a second later
+    - movement: a step goes to the free neighboring hex closest to the
+      target, if that's closer at all (Board.search_path plans around
+      walls of units with a distance field, this doesn't)
+    - mana: MANA_PER_ATK per attack, min(MAX_MANA_FROM_DMG,
+      int(dmg * MANA_PER_DMG)) per hit taken, before mitigation
+    - damage: armor / mr mitigation as in Unit.receive_damage, truncated
+      to int, eaten by shields before hp; a unit dies at hp < 0
+    - spells: at full mana a unit casts a generic spell, SPELL_DMG
+      magical damage to its target plus a SPELL_SHIELD shield
+    - the round result & player damage as in Board.resolve_game
+
+but not champion specific spell shapes (cones, pulls, projectiles) or
+hex reservations. the asyncio engine is the reference, this is for
+quick win rate estimates; on the benchmark compositions it calls the
+same winner as the engine
+
+team specs are the same (name, star, position) lists runner uses
+'''
+from collections import namedtuple
+
+import numpy as np
+
+from board import Board
+from champions import Unit
+from hex_utils import HexGrid
+
+
+NEIGHBORS = np.array(HexGrid.NEIGHBORS)
+
+
+def _distances(x0, y0, x1, y1):
+    ''' doublewidth_distance, elementwise over arrays '''
+    dx = np.abs(x0 - x1)
+    dy = np.abs(y0 - y1)
+    return dy + np.maximum(0, (dx - dy) // 2)
+
+
+BatchResult = namedtuple('BatchResult', ['winners', 'damage', 'hp'])
+''' winners: (n,) team id or -1 for a draw, damage: (n, 2) player damage
+    per team, hp: (n, units) final hp, units in spawn order '''
+
+
+def _spawn_units(team1, team2):
+    '''
+    units & board positions in the order Board places them, which is
+    also the order targeting ties break in
+    '''
+    units = []
+    for team_id, team in enumerate((team1, team2)):
+        for name, star, position in sorted(team, key=lambda c: tuple(c[2])):
+            x, y = position
+            if y < 0:
+                continue
+            if team_id == 1:
+                x, y = Board.WIDTH - x, Board.HEIGHT - y
+            units.append((team_id, Unit.from_name(name, star=star,
+                                                  position=position), (x, y)))
+    return units
+
+
+class BatchSimulator:
+    '''
+    @n: fights to run in lockstep
+    @dt: game seconds per step
+    @jitter: if > 0, every unit in every fight gets its attack period
+        scaled by a random factor in [1 - jitter, 1 + jitter], so the
+        fights actually differ (the engine itself has no randomness)
+    '''
+    def __init__(self, team1, team2, n, dt=0.05, timeout=45, jitter=0.0,
+                 seed=None):
+        self.n = n
+        self.dt = dt
+        self.timeout = timeout
+
+        spawned = _spawn_units(team1, team2)
+        self.units = [unit for _, unit, _ in spawned]
+        U = len(spawned)
+
+        def column(values, dtype=float):
+            return np.array(values, dtype=dtype)
+
+        self.team = column([team_id for team_id, _, _ in spawned], int)
+        self.star = column([u.star for u in self.units], int)
+        self.ad = column([u.ad for u in self.units])
+        self.atspd = column([u.atspd for u in self.units])
+        self.armor = column([u.armor for u in self.units])
+        self.mr = column([u.mr for u in self.units])
+        self.range = column([u.range for u in self.units])
+        self.max_mana = column([u.max_mana for u in self.units])
+        self.mana_per_atk = column([u.mana_per_atk for u in self.units])
+        self.mana_per_dmg = column([u.MANA_PER_DMG for u in self.units])
+        self.max_mana_from_dmg = column([u.MAX_MANA_FROM_DMG for u in self.units])
+        self.spell_dmg = column([u.SPELL_DMG for u in self.units])
+        self.spell_shield = column([u.SPELL_SHIELD for u in self.units])
+
+        self.enemies = self.team[:, None] != self.team[None, :]
+
+        # batched state, (n, U)
+        self.x = np.tile(column([pos[0] for _, _, pos in spawned], int), (n, 1))
+        self.y = np.tile(column([pos[1] for _, _, pos in spawned], int), (n, 1))
+        self.hp = np.tile(column([u.hp for u in self.units]), (n, 1))
+        self.mana = np.tile(column([u.mana for u in self.units]), (n, 1))
+        self.shield = np.zeros((n, U))
+        self.alive = np.ones((n, U), dtype=bool)
+        self.target = np.full((n, U), -1)
+        self.next_attack = np.full((n, U), np.inf)
+
+        period = np.tile(1 / self.atspd, (n, 1))
+        if jitter > 0:
+            rng = np.random.default_rng(seed)
+            period *= rng.uniform(1 - jitter, 1 + jitter, size=(n, U))
+        self.period = period
+
+        self.time = 0.0
+        self.done = np.zeros(n, dtype=bool)
+
+    def _distance_matrix(self):
+        ''' (n, U, U) distances between every pair of units, per fight '''
+        return _distances(self.x[:, :, None], self.y[:, :, None],
+                          self.x[:, None, :], self.y[:, None, :])
+
+    def _acquire_targets(self, distance):
+        ''' targets for units whose target is gone, nearest enemy first '''
+        rows = np.arange(self.n)[:, None]
+        has_target = self.target >= 0
+        target_alive = self.alive[rows, np.maximum(self.target, 0)] & has_target
+        need = self.alive & ~target_alive & ~self.done[:, None]
+        if not need.any():
+            return
+
+        # (n, U, U): distance to every living enemy, inf otherwise
+        candidates = self.enemies[None] & self.alive[:, None, :]
+        cost = np.where(candidates, distance, np.inf)
+        nearest = cost.argmin(axis=2)  # first index wins ties, i.e. lowest id
+        found = np.take_along_axis(cost, nearest[..., None], axis=2)[..., 0] < np.inf
+
+        new = need & found
+        self.target = np.where(new, nearest, np.where(need, -1, self.target))
+
+        # a unit already mid-swing just carries on against the new target
+        idle = np.isinf(self.next_attack)
+        self.next_attack = np.where(new & idle, self.time + 0.5 * self.period,
+                                    np.where(need & ~found, np.inf,
+                                             self.next_attack))
+
+    def _step_towards_targets(self, movers):
+        '''
+        move each of @movers (n, U) one hex toward its target, units one
+        after another so two of them never end up on the same hex
+        '''
+        for u in np.flatnonzero(movers.any(axis=0)):
+            r = np.flatnonzero(movers[:, u])
+            t = self.target[r, u]
+            x, y = self.x[r, u], self.y[r, u]
+            tx, ty = self.x[r, t], self.y[r, t]
+
+            # (k, 6) neighboring hexes
+            nx = x[:, None] + NEIGHBORS[:, 0]
+            ny = y[:, None] + NEIGHBORS[:, 1]
+
+            # on the grid, or for units still off it (mirrored p2 spots),
+            # the looser bounds Board._greedy_step uses
+            on_grid = (x < Board.WIDTH) & (y < Board.HEIGHT)
+            width = np.where(on_grid, Board.WIDTH - 1, Board.WIDTH)[:, None]
+            height = np.where(on_grid, Board.HEIGHT - 1, Board.HEIGHT)[:, None]
+            inside = (nx >= 0) & (nx <= width) & (ny >= 0) & (ny <= height)
+
+            # (k, 6, U) is any living unit standing there
+            taken = ((nx[..., None] == self.x[r, None, :])
+                     & (ny[..., None] == self.y[r, None, :])
+                     & self.alive[r, None, :]).any(axis=2)
+
+            cost = np.where(inside & ~taken,
+                            _distances(nx, ny, tx[:, None], ty[:, None]), np.inf)
+            best = cost.argmin(axis=1)  # ties go to the first neighbor
+            closer = cost[np.arange(len(r)), best] < _distances(x, y, tx, ty)
+
+            r, best = r[closer], best[closer]
+            self.x[r, u] = nx[closer, best]
+            self.y[r, u] = ny[closer, best]
+
+    def _hit(self, attacker_mask, dmg, dmg_type):
+        '''
+        @attacker_mask (n, U) units dealing @dmg (per unit) of @dmg_type
+        to their targets this step
+        '''
+        rows = np.arange(self.n)
+        for u in np.flatnonzero(attacker_mask.any(axis=0)):
+            hits = attacker_mask[:, u]
+            if dmg[u] <= 0:
+                continue
+            r = rows[hits]
+            t = self.target[hits, u]
+            raw = dmg[u]
+
+            # Unit.receive_damage: mana first, from the raw damage
+            gained = np.minimum(self.max_mana_from_dmg[t],
+                                np.floor(raw * self.mana_per_dmg[t]))
+            self.mana[r, t] += gained
+
+            if dmg_type == 'physical':
+                resist = self.armor[t]
+            else:
+                resist = self.mr[t]
+            taken = np.floor(raw * (1 - resist / (100 + resist)))
+
+            # Unit.on_damage: shields eat it first
+            absorbed = np.minimum(self.shield[r, t], taken)
+            self.shield[r, t] -= absorbed
+            self.hp[r, t] -= taken - absorbed
+
+    def step(self):
+        distance = self._distance_matrix()
+        self._acquire_targets(distance)
+        active = self.alive & ~self.done[:, None]
+
+        # swings whose wind-up is over: hit if in range, else step closer
+        # and look again a second later, like Unit.autoattack
+        due = active & (self.target >= 0) & (self.next_attack <= self.time)
+        target_distance = np.take_along_axis(
+            distance, np.maximum(self.target, 0)[..., None], axis=2)[..., 0]
+        in_range = target_distance <= self.range
+        attacking = due & in_range
+        moving = due & ~in_range
+
+        if moving.any():
+            self._step_towards_targets(moving)
+            self.next_attack = np.where(moving, self.next_attack + 1,
+                                        self.next_attack)
+
+        if attacking.any():
+            self._hit(attacking, self.ad, 'physical')
+            self.mana += attacking * self.mana_per_atk
+            self.next_attack = np.where(attacking,
+                                        self.next_attack + self.period,
+                                        self.next_attack)
+
+        casting = active & (self.max_mana > 0) & (self.mana >= self.max_mana)
+        if casting.any():
+            self.mana = np.where(casting, 0, self.mana)
+            self._hit(casting & (self.target >= 0), self.spell_dmg, 'magical')
+            self.shield += casting * self.spell_shield
+
+        self.alive &= self.hp >= 0
+
+        for team_id in (0, 1):
+            wiped = ~(self.alive & (self.team == team_id)).any(axis=1)
+            self.done |= wiped
+        self.time += self.dt
+
+    def run(self):
+        while self.time < self.timeout and not self.done.all():
+            self.step()
+        return self.result()
+
+    def result(self):
+        ''' round results the way Board.resolve_game scores them '''
+        survivors = [(self.alive & (self.team == t)) for t in (0, 1)]
+        wiped = [~s.any(axis=1) for s in survivors]
+        stars = [(s * self.star).sum(axis=1) for s in survivors]
+
+        winners = np.where(wiped[1], 0, np.where(wiped[0], 1, -1))
+        damage = np.stack([wiped[0] * 2 + stars[1],
+                           wiped[1] * 2 + stars[0]], axis=1)
+        return BatchResult(winners, damage, self.hp.copy())
+
+
+def simulate(team1, team2, n, **kwargs):
+    ''' run @n lockstep fights, kwargs as BatchSimulator takes them '''
+    return BatchSimulator(team1, team2, n, **kwargs).run()
+
+
+def win_rates(team1, team2, n, **kwargs):
+    ''' the same summary as runner.win_rates, from one batch '''
+    if n <= 0:
+        return {'fights': 0, 'wins': [0, 0], 'draws': 0,
+                'win_rate': [0.0, 0.0], 'avg_damage': [0.0, 0.0]}
+
+    result = simulate(team1, team2, n, **kwargs)
+    wins = [int((result.winners == t).sum()) for t in (0, 1)]
+    return {
+        'fights': n,
+        'wins': wins,
+        'draws': int((result.winners == -1).sum()),
+        'win_rate': [w / n for w in wins],
+        'avg_damage': result.damage.mean(axis=0).tolist(),
+    }
+
+
+if __name__ == '__main__':
+    TEAM_1 = [('Blitzcrank', 1, (0, 0)), ('Ahri', 1, (2, 0)),
+              ('Poppy', 1, (3, 3))]
+    TEAM_2 = [('Annie', 1, (1, 1)), ('Jayce', 1, (1, 3)),
+              ('Jhin', 1, (5, 3))]
+    print(win_rates(TEAM_1, TEAM_2, 10000, jitter=0.2, seed=0))
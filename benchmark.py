@@ -0,0 +1,285 @@
+'''
+benchmarks for the simulation hot paths
+
+times the primitives every tick leans on (distances, targeting,
+pathing, area queries, damage, projectile updates) plus whole headless
+fights per second for a few canned compositions
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json
+
+--compare flags every benchmark that got more than --threshold slower
+than the baseline and exits non-zero if any did
+'''
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from board import Board
+from combat_log import CombatLogger, OFF
+from hex_utils import doublewidth_distance
+from projectile import Projectile
+from runner import make_player, run_fight
+
+
+# same boards as main.setup & runner's demo
+COMPOSITIONS = {
+    'main_setup': (
+        [('Blitzcrank', 1, (0, 0)), ('Ahri', 1, (2, 0)), ('Poppy', 1, (3, 3))],
+        [('Annie', 1, (1, 1)), ('Jayce', 1, (1, 3)), ('Jhin', 1, (5, 3))],
+    ),
+    'two_star_duel': (
+        [('Jayce', 2, (1, 1))],
+        [('Poppy', 2, (3, 1))],
+    ),
+    'full_lines': (
+        [('Blitzcrank', 1, (0, 0)), ('Ahri', 1, (2, 0)), ('Poppy', 1, (4, 0)),
+         ('Jayce', 1, (1, 1)), ('Annie', 1, (3, 1)), ('Jhin', 1, (5, 1))],
+        [('Annie', 1, (0, 0)), ('Jayce', 1, (2, 0)), ('Jhin', 1, (4, 0)),
+         ('Poppy', 1, (1, 1)), ('Ahri', 1, (3, 1)), ('Blitzcrank', 1, (5, 1))],
+    ),
+}
+
+
+def make_board(composition='main_setup'):
+    ''' a headless, silent board for @composition, not started '''
+    team1, team2 = COMPOSITIONS[composition]
+    return Board(make_player(team1), make_player(team2), headless=True,
+                 logger=CombatLogger(level=OFF))
+
+
+def _units_by_team(board):
+    return [sorted(team, key=lambda u: u._id) for team in board.teams]
+
+
+''' primitive benchmarks; each returns a zero-arg callable to time '''
+def bench_doublewidth_distance(board):
+    pairs = [(a, b) for a in board.spaces for b in board.spaces[::4]]
+
+    def run():
+        for a, b in pairs:
+            doublewidth_distance(a, b)
+    return run, len(pairs)
+
+
+def bench_closest_unit(board):
+    units = sorted(board.units, key=lambda u: u._id)
+
+    def run():
+        for unit in units:
+            board.closest_unit(unit)
+    return run, len(units)
+
+
+def bench_search_path(board):
+    team1, team2 = _units_by_team(board)
+    unit, target = team1[0], team2[-1]
+    start = unit.position
+
+    def run():
+        # every real step changes occupancy, so the distance field gets
+        # rebuilt each time; step back so every call does the same work
+        board.search_path(unit, target)
+        if unit.position != start:
+            board.move_unit(unit, start)
+    return run, 1
+
+
+def bench_line_trace(board):
+    team1, team2 = _units_by_team(board)
+    start, target = team1[0].position, team2[0].position
+
+    def run():
+        board.line_trace(start, target, width=1, length=12, exclude_team=0)
+    return run, 1
+
+
+def bench_circle_range(board):
+    center = _units_by_team(board)[1][0].position
+
+    def run():
+        board.circle_range(center, radius=2, exclude_team=1)
+    return run, 1
+
+
+def bench_cone_range(board):
+    team1, team2 = _units_by_team(board)
+    center, edge = team1[0].position, team2[0].position
+
+    def run():
+        board.cone_range(center, edge, span=1, length=3, exclude_team=0)
+    return run, 1
+
+
+def bench_receive_damage(board):
+    target = _units_by_team(board)[1][0]
+    source = _units_by_team(board)[0][0]
+
+    def run():
+        target.receive_damage(10, source, 'physical')
+        target.receive_damage(10, source, 'magical')
+        target.hp = target.max_hp
+        target.mana = 0
+    return run, 2
+
+
+def bench_projectile_update(board):
+    team1, team2 = _units_by_team(board)
+    owner = team1[0]
+    projectile = Projectile(owner, owner.position, team2[-1].position, 2,
+                            collision_func=lambda unit: None)
+    x, y = projectile.x, projectile.y
+
+    def run():
+        projectile.x, projectile.y = x, y
+        projectile.last_update = 0
+        projectile.atDestination = False
+        projectile.collided_targets.clear()
+        projectile.update(Board.PROJECTILE_TICK)
+    return run, 1
+
+
+PRIMITIVES = {
+    'doublewidth_distance': bench_doublewidth_distance,
+    'closest_unit': bench_closest_unit,
+    'search_path': bench_search_path,
+    'line_trace': bench_line_trace,
+    'circle_range': bench_circle_range,
+    'cone_range': bench_cone_range,
+    'receive_damage': bench_receive_damage,
+    'projectile_update': bench_projectile_update,
+}
+
+
+def time_primitive(name, repeat=5):
+    ''' best of @repeat, in microseconds per call '''
+    run, calls = PRIMITIVES[name](make_board())
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * calls) * 1e6
+
+
+def time_fights(composition, duration=2.0):
+    ''' headless fights per second on the simulated clock '''
+    team1, team2 = COMPOSITIONS[composition]
+    fights = 0
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        while True:
+            run_fight(team1, team2, index=fights)
+            fights += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+    return fights / elapsed
+
+
+def run_benchmarks(primitives=None, compositions=None, repeat=5,
+                   fight_duration=2.0):
+    '''
+    {benchmark name: {'value', 'unit', 'higher_is_better'}}
+
+    @primitives, compositions: names to run, everything by default
+    '''
+    results = {}
+    for name in primitives if primitives is not None else PRIMITIVES:
+        results[name] = {'value': time_primitive(name, repeat),
+                         'unit': 'us/call', 'higher_is_better': False}
+        print('%-24s %10.2f us/call' % (name, results[name]['value']))
+
+    for name in compositions if compositions is not None else COMPOSITIONS:
+        key = 'fights/' + name
+        results[key] = {'value': time_fights(name, fight_duration),
+                        'unit': 'fights/s', 'higher_is_better': True}
+        print('%-24s %10.2f fights/s' % (key, results[key]['value']))
+
+    return results
+
+
+def environment():
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f,
+                  indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    compare @results against a saved @baseline (the dict save() writes);
+    returns the names of the benchmarks that regressed by more than
+    @threshold (0.1 = 10% slower)
+    '''
+    regressions = []
+    for name, old in sorted(baseline['results'].items()):
+        new = results.get(name)
+        if new is None:
+            continue
+
+        # express both as a slowdown factor, > 1 is worse
+        if old['higher_is_better']:
+            slowdown = old['value'] / new['value']
+        else:
+            slowdown = new['value'] / old['value']
+
+        flag = ''
+        if slowdown > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('%-24s %10.2f -> %10.2f %-8s (%+.1f%%)%s'
+              % (name, old['value'], new['value'], new['unit'],
+                 (slowdown - 1) * 100, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the results to a JSON file')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare against a saved JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown that counts as a regression (default 0.1)')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help='primitives and/or compositions to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fight-duration', type=float, default=2.0,
+                        help='seconds spent on each composition')
+    args = parser.parse_args()
+
+    primitives = compositions = None
+    if args.only:
+        primitives = [n for n in args.only if n in PRIMITIVES]
+        compositions = [n for n in args.only if n in COMPOSITIONS]
+
+    results = run_benchmarks(primitives, compositions, repeat=args.repeat,
+                             fight_duration=args.fight_duration)
+
+    if args.save:
+        save(results, args.save)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('\ncompared to %s (%s)' % (args.compare,
+                                         baseline['environment']['date']))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
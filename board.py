@@ -1,25 +1,23 @@
 import asyncio
 import json
 import math
-import sys, pygame, math
 from copy import copy, deepcopy
 
+import numpy as np
+
 from champions import Unit
+from combat_log import CombatLogger, DEBUG, INFO
+from effects import EffectScheduler
 from hex_utils import (doublewidth_distance, 
                        doublewidth_rotation,
+                       hex_grid,
                        Position)
 
 from projectile import Projectile
+from unit_store import UnitStore
 
-BLACK = 0, 0, 0
-WHITE = 255, 255, 255
-GREEN = 0, 128, 0
-RED = 128, 0, 0
-BLUE = 0, 0, 128
-DARKBLUE = 0, 0, 255
-pygame.init()
-font = pygame.font.SysFont("comicsans", 24)
 
+SQRT3 = math.sqrt(3)
 
 
 class Board:
@@ -27,25 +25,72 @@ class Board:
     HEIGHT = 5
     MARGIN = 60
     HEX_LENGTH = 100  # Euclidean length for display
+    PROJECTILE_TICK = 0.05  # game seconds between projectile updates
+    TARGET_SCAN_LIMIT = 4  # candidates closest_unit checks directly, not by rings
     _neighbors = [(-2, 0), (-1, 1), (1, 1), 
                   (2, 0), (1, -1), (-1, -1)]
 
-    def __init__(self, p1, p2, speed=1):
+    def __init__(self, p1, p2, speed=1, headless=False, logger=None,
+                 recorder=None, profiler=None):
+        '''
+        @headless: if True, never touch pygame display, fonts or images;
+            the battle only runs the simulation
+        @logger: combat_log.CombatLogger shared by the board & its units,
+            by default buffered to stdout
+        @recorder: optional replay.ReplayRecorder to record the fight
+        @profiler: optional instrumentation.FightProfiler counting calls
+            & time spent in the hot paths
+        '''
         self.players = (p1, p2)
         self.teams = (set(), set())
         self.units = set()
+        self.store = UnitStore()  # per-unit state columns, see unit_store
+        self._occupancy = {}  # position -> unit standing on it
+        self._occupancy_version = 0
+        self._reservations = {}  # position -> unit about to step there
+        # targeting index: per team, hex id -> unit, plus units off the grid
+        self._team_hexes = ({}, {})
+        self._team_offgrid = (set(), set())
+        self._distance_fields = {}
+        self._fields_version = 0
+        self._arrays = None  # (units, positions, teams), see unit_arrays
+        self._arrays_version = -1
         self._id = 0
         self.speed = speed
-        self.spaces = sum([[Position(x, y) for x in range(y%2, self.WIDTH, 2)] for y in range(self.HEIGHT)], [])
-
-        _x, _y = self.get_hex_center_euc((self.WIDTH+1, self.HEIGHT))
-        self.screen_size = (int(_x) + self.MARGIN, int(_y) + self.MARGIN)
-        self.screen = pygame.display.set_mode(self.screen_size)
-        self.projectiles = set()
+        self.logger = logger if logger is not None else CombatLogger()
+        self.recorder = recorder
+        if recorder:
+            recorder.attach(self)
+        self.profiler = profiler
+        if profiler:
+            profiler.attach(self)
+        self.grid = hex_grid(self.WIDTH, self.HEIGHT)
+        self.spaces = self.grid.spaces
+
+        if headless:
+            self.renderer = None
+        else:
+            # only import pygame when we actually draw
+            from renderer import PygameRenderer
+            self.renderer = PygameRenderer(self)
+
+        self.effects = EffectScheduler(self)
+        # a dict as an ordered set: projectiles update in launch order,
+        # a set's order would depend on memory addresses
+        self.projectiles = {}
+        self._projectile_launched = asyncio.Event()
         self.isGameActive = False
+        self._game_over = asyncio.Event()
+        self._changed = None  # asyncio.Event for wait_for_change, if anyone waits
         self.resolvingGameTask = None
-
-        for unit in p1.champions:
+        self.loop = None
+        self._loop_start = 0
+        self.winner = None  # team id, filled in by resolve_game
+        self.damage = None
+
+        # place units in a fixed order so ids (and thus every tie-break)
+        # are the same on every run
+        for unit in sorted(p1.champions, key=lambda u: tuple(u.position)):
             x, y = unit.position
             if y >= 0:
                 self.add_unit(unit, 0, Position(x, y))
@@ -53,19 +98,67 @@ class Board:
 
         ## TODO: class actives
 
-        for unit in p2.champions:
+        for unit in sorted(p2.champions, key=lambda u: tuple(u.position)):
             x, y = unit.position
             if y >= 0:
                 self.add_unit(unit, 1, 
                               (self.WIDTH - x, self.HEIGHT - y))
 
+    @property
+    def headless(self):
+        return self.renderer is None
+
     async def sleep(self, time):
         await asyncio.sleep(time / self.speed)
 
+    def now(self):
+        '''
+        seconds of game time since the battle started
+
+        reads the running loop's clock, so it is virtual time when
+        the board runs on a sim_clock.SimulatedEventLoop
+        '''
+        if self.loop is None:
+            return 0
+        return (self.loop.time() - self._loop_start) * self.speed
+
+    def log(self, msg, *args, level=DEBUG):
+        if level >= self.logger.level:
+            self.logger.record(level, self.now(), 'board', None, msg, args)
+
+    def call_later(self, delay, callback, *args):
+        ''' schedule on the board's clock; @delay is in game seconds '''
+        return self.loop.call_later(delay / self.speed, callback, *args)
+
+    def call_at(self, when, callback, *args):
+        ''' schedule at game time @when '''
+        return self.loop.call_at(self._loop_start + when / self.speed,
+                                 callback, *args)
+
     ''' list attr getters. TODO: add locks to avoid sync issues '''
     def get_projectiles(self):
         return copy(self.projectiles)
 
+    def add_projectile(self, projectile):
+        self.projectiles[projectile] = None
+        self._projectile_launched.set()
+
+    def update_projectiles(self):
+        now = self.now()
+        for p in self.get_projectiles():
+            p.update(now)
+            if p.atDestination:
+                del self.projectiles[p]
+
+    async def run_projectiles(self):
+        ''' advance projectiles on the game clock, independent of drawing '''
+        while True:
+            if not self.projectiles:
+                self._projectile_launched.clear()
+                await self._projectile_launched.wait()
+            await self.sleep(self.PROJECTILE_TICK)
+            self.update_projectiles()
+
 
 
 
@@ -78,43 +171,153 @@ class Board:
             return False
         return (x+y)%2 == 0
 
+    def distance(self, pos1, pos2):
+        ''' hex distance through the precomputed table where possible '''
+        return self.grid.distance(pos1, pos2)
+
+    def unit_distance(self, unit, other):
+        i = unit.hex_id
+        j = other.hex_id
+        if i is None or j is None:
+            return doublewidth_distance(unit.position, other.position)
+        return self.grid.distances[i * self.grid.size + j]
+
+    def distance_field(self, target_pos, atk_range):
+        '''
+        number of steps from every hex to the nearest empty hex within
+        @atk_range of @target_pos, walking over empty hexes only
+        (None where unreachable or occupied), indexed by hex id
+
+        fields are cached per (target, range) until occupancy changes
+        '''
+        if self._fields_version != self._occupancy_version:
+            self._distance_fields.clear()
+            self._fields_version = self._occupancy_version
+
+        key = (target_pos, atk_range)
+        field = self._distance_fields.get(key)
+        if field is not None:
+            return field
+
+        grid = self.grid
+        occupied = self._occupancy
+        field = [None] * grid.size
+        frontier = []
+        for i, pos in enumerate(grid.spaces):
+            if pos not in occupied and grid.distance(pos, target_pos) <= atk_range:
+                field[i] = 0
+                frontier.append(i)
+
+        # plain BFS, every step costs the same
+        steps = 0
+        while frontier:
+            steps += 1
+            next_frontier = []
+            for i in frontier:
+                for n in grid.neighbors[i]:
+                    if field[n] is None and grid.spaces[n] not in occupied:
+                        field[n] = steps
+                        next_frontier.append(n)
+            frontier = next_frontier
+
+        self._distance_fields[key] = field
+        return field
+
 
     def search_path(self, source_unit, target_unit):
         '''
         champion path-finding
 
-        only makes a single step
+        only makes a single step, downhill along the distance field
+        towards the target, skipping hexes other units reserved; then
+        reserves the following step so other movers plan around it
         '''
         start_pos = source_unit.position
         target_pos = target_unit.position
         atk_range = source_unit.range
 
-        curr_dist = doublewidth_distance(start_pos, target_pos)
-        if curr_dist <= atk_range:
+        self.release_reservation(source_unit)
+        if self.unit_distance(source_unit, target_unit) <= atk_range:
+            return start_pos
+
+        start = source_unit.hex_id
+        if start is None:
+            return self._greedy_step(source_unit, target_pos)
+
+        field = self.distance_field(target_pos, atk_range)
+        levels = [field[n] for n in self.grid.neighbors[start]
+                  if field[n] is not None]
+        if not levels:
+            # walled off, try to get closer
+            return self._greedy_step(source_unit, target_pos)
+
+        # our own hex is occupied (by us), so its field value is one more
+        # than the best neighbor's; only take a step that is strictly
+        # downhill from there. if those hexes are all reserved, wait a
+        # tick rather than stepping sideways or back
+        step = self._downhill_neighbor(source_unit, start, field,
+                                       below=min(levels) + 1)
+        if step is None:
             return start_pos
 
+        tentative_pos = self.grid.spaces[step]
+        self.move_unit(source_unit, tentative_pos)
+        source_unit.log('moving to %s', tentative_pos)
+
+        # field is stale by our own move, but still a fine plan
+        next_step = self._downhill_neighbor(source_unit, step, field,
+                                            below=field[step])
+        if next_step is not None:
+            self.reserve_hex(source_unit, self.grid.spaces[next_step])
+
+        return tentative_pos
+
+
+    def _downhill_neighbor(self, unit, hex_id, field, below=None):
+        ''' neighbor of @hex_id with the lowest field value, or None '''
+        best = None
+        best_dist = below
+        for n in self.grid.neighbors[hex_id]:
+            d = field[n]
+            if d is None or (best_dist is not None and d >= best_dist):
+                continue
+            pos = self.grid.spaces[n]
+            if pos in self._occupancy:
+                continue
+            owner = self._reservations.get(pos)
+            if owner is not None and owner is not unit:
+                continue
+            best = n
+            best_dist = d
+        return best
+
+
+    def _greedy_step(self, source_unit, target_pos):
+        ''' take the first free neighbor closer to target, if any '''
+        start_pos = source_unit.position
+        curr_dist = self.distance(start_pos, target_pos)
+
         for neighbor in self._neighbors:
             tentative_pos = start_pos + neighbor
             if (self.get_unit_at_pos(tentative_pos) is not None
+                    or not self.is_free(tentative_pos, source_unit)
                     or tentative_pos[0] < 0
                     or tentative_pos[0] > self.WIDTH
                     or tentative_pos[1] < 0
                     or tentative_pos[1] > self.HEIGHT):
                 continue
 
-            if doublewidth_distance(tentative_pos, target_pos) < curr_dist:
+            if self.distance(tentative_pos, target_pos) < curr_dist:
                 # take a step closer
-
-                # TODO: update board pos
                 self.move_unit(source_unit, tentative_pos)
-                source_unit.log(f'moving to {tentative_pos}')
+                source_unit.log('moving to %s', tentative_pos)
 
                 return tentative_pos
 
         return start_pos
 
 
-    def line_trace(self, start, target, width=1, length=-1):
+    def line_trace(self, start, target, width=1, length=-1, exclude_team=None):
         '''
         https://math.stackexchange.com/a/190373 - find point in rectangle
 
@@ -125,13 +328,15 @@ class Board:
         else it traces a line of Euclidean length `length`
         adjacent hexes have Euclidean dist 2
         y-coords need to be scaled by sqrt(3) to go from hex -> euc
+
+        area queries take @exclude_team to skip e.g. the caster's allies
         '''
         if isinstance(start, Unit):
             start = start.position
         if isinstance(target, Unit):
             target = target.position
 
-        print('line tracing:', start, target, width, length)
+        self.log('line tracing: %s %s %s %s', start, target, width, length)
 
         x0, y0 = start  # center of start of rectangle/line
         x1, y1 = target  # center of end of rectangle/line
@@ -155,37 +360,35 @@ class Board:
         rect_base_pt = (x0 - width * line_vec_y,
                        y0 + width * line_vec_x)
 
-        hits = []
-
-        for unit in self.units:
-            # directly check if pt in rectangle
+        units, positions, teams = self.unit_arrays()
 
-            pos_euc = unit.position * (1, math.sqrt(3))
+        # directly check which pts are in the rectangle
+        pt_vec = positions * (1, SQRT3) - rect_base_pt
+        width_dot = pt_vec @ rect_width_vec
+        length_dot = pt_vec @ rect_length_vec
 
-            pt_vec = pos_euc - rect_base_pt
+        mask = ((width_dot > -0.01) & (width_dot < 4*width*width+0.01)
+                & (length_dot > -0.01) & (length_dot < length*length+0.01))
+        hits = self._masked_units(units, teams, mask, exclude_team)
 
-            width_dot = pt_vec[0]*rect_width_vec[0] + pt_vec[1]*rect_width_vec[1]
-            length_dot = pt_vec[0]*rect_length_vec[0] + pt_vec[1]*rect_length_vec[1]
-            
-            if (width_dot > -0.01 and width_dot < 4*width*width+0.01
-                and length_dot > -0.01 and length_dot < length*length+0.01):
-                    hits.append(unit)
-
-        print(hits)
+        if self.logger.is_enabled(DEBUG):
+            # units format lazily, so snapshot them while they're current
+            self.log('line trace hitting: %s', repr(hits))
         return hits
 
 
-    def circle_range(self, center, radius=1):
-        hits = []
-        for unit in self.units:
-            if doublewidth_distance(unit.position, center) <= radius:
-                hits.append(unit)
+    def circle_range(self, center, radius=1, exclude_team=None):
+        units, positions, teams = self.unit_arrays()
+        mask = self._array_distances(positions, center) <= radius
+        hits = self._masked_units(units, teams, mask, exclude_team)
 
-        print(f'circle range: center {center} radius {radius}, hitting: {hits}')
+        if self.logger.is_enabled(DEBUG):
+            self.log('circle range: center %s radius %s, hitting: %s',
+                     center, radius, repr(hits))
         return hits
 
 
-    def cone_range(self, center, left_edge, span=1, length=2):
+    def cone_range(self, center, left_edge, span=1, length=2, exclude_team=None):
         '''
         @span: number of cone degrees as multiple of 60
         @length: side length of cone, in hexes
@@ -206,32 +409,123 @@ class Board:
             corners.append(next_corner)
 
 
-        hits = []
-        for unit in self.units:
-            if doublewidth_distance(unit.position, center) > length:
-                continue
+        units, positions, teams = self.unit_arrays()
+
+        # each unit needs to be within [length] of the center AND two consecutive corners
+        in_range = np.array([self._array_distances(positions, c) <= length
+                             for c in corners])
+        mask = ((self._array_distances(positions, center) <= length)
+                & (in_range[:-1] & in_range[1:]).any(axis=0))
+        hits = self._masked_units(units, teams, mask, exclude_team)
 
-            # each unit needs to be within [length] of the center AND two consecutive corners
-            prev_in_range = False
-            for c in corners:
-                if doublewidth_distance(unit.position, c) <= length:
-                    if prev_in_range:
-                        hits.append(unit)
-                        break
-                    prev_in_range = True
-                else:
-                    prev_in_range = False
-
-        print(f'cone range: center {center} corners {corners}, hitting: {hits}')
+        if self.logger.is_enabled(DEBUG):
+            self.log('cone range: center %s corners %s, hitting: %s',
+                     center, corners, repr(hits))
         return hits
 
 
+    def units_near_segment(self, x0, y0, x1, y1, radius):
+        '''
+        broadphase for projectiles: units whose hex center might lie
+        within @radius of the segment (x0, y0)-(x1, y1), ordered along it
+
+        coordinates are euclidean board space (rows scaled by sqrt(3));
+        the occupancy map doubles as a spatial hash, so we only look up
+        the hexes inside the segment's padded bounding box, splitting
+        long segments so the boxes stay tight
+        '''
+        occupancy = self._occupancy
+        length = math.sqrt((x1-x0)**2 + (y1-y0)**2)
+        pieces = max(1, int(length / 2))
+
+        seen = set()
+        found = []
+        for k in range(pieces):
+            ax = x0 + (x1-x0) * k / pieces
+            ay = y0 + (y1-y0) * k / pieces
+            bx = x0 + (x1-x0) * (k+1) / pieces
+            by = y0 + (y1-y0) * (k+1) / pieces
+
+            c_min = math.floor(min(ax, bx) - radius)
+            c_max = math.ceil(max(ax, bx) + radius)
+            r_min = math.floor((min(ay, by) - radius) / SQRT3)
+            r_max = math.ceil((max(ay, by) + radius) / SQRT3)
+            for r in range(r_min, r_max + 1):
+                for c in range(c_min + (c_min + r) % 2, c_max + 1, 2):
+                    unit = occupancy.get((c, r))
+                    if unit is not None and unit not in seen:
+                        seen.add(unit)
+                        found.append(unit)
+
+        if len(found) > 1 and length > 0:
+            # closest to the start of the segment first
+            found.sort(key=lambda u: ((u.position[0]-x0)*(x1-x0)
+                                      + (u.position[1]*SQRT3-y0)*(y1-y0)))
+        return found
+
+    def unit_arrays(self):
+        '''
+        array-backed view of the units on the board, in id order:
+        (units, positions as an (n, 2) int array, team ids)
+
+        gathered from the store's columns, lazily whenever occupancy
+        changed
+        '''
+        if self._arrays_version != self._occupancy_version:
+            store = self.store
+            slots = store.alive_slots()
+            self._arrays = (store.units_at(slots), store.positions(slots),
+                            store.team[slots])
+            self._arrays_version = self._occupancy_version
+        return self._arrays
+
+    @staticmethod
+    def _array_distances(positions, pos):
+        ''' doublewidth_distance from every row of @positions to @pos '''
+        dx = np.abs(positions[:, 0] - pos[0])
+        dy = np.abs(positions[:, 1] - pos[1])
+        return dy + np.maximum(0, (dx - dy) // 2)
+
+    @staticmethod
+    def _masked_units(units, teams, mask, exclude_team=None):
+        if exclude_team is not None:
+            mask &= teams != exclude_team
+        return [units[i] for i in np.flatnonzero(mask)]
+
+
     ''' unit placement logic '''
+    async def wait_for_change(self):
+        ''' returns once a unit was added, moved or removed '''
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        await self._changed.wait()
+
+    def _notify_change(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
     def get_unit_at_pos(self, pos):
-        for unit in self.units:
-            if unit.position == pos:
-                return unit
-        return None
+        return self._occupancy.get(pos)
+
+    def is_free(self, pos, unit=None):
+        ''' nobody stands on @pos, and nobody but @unit reserved it '''
+        if pos in self._occupancy:
+            return False
+        owner = self._reservations.get(pos)
+        return owner is None or owner is unit
+
+    def reserve_hex(self, unit, pos):
+        self.release_reservation(unit)
+        self._reservations[pos] = unit
+        unit.reserved_hex = pos
+
+    def release_reservation(self, unit):
+        pos = unit.reserved_hex
+        if pos is not None:
+            if self._reservations.get(pos) is unit:
+                del self._reservations[pos]
+            unit.reserved_hex = None
 
 
     def add_unit(self, unit, team_id, position):
@@ -240,38 +534,138 @@ class Board:
         unit.team_id = team_id
         unit._id = self._id
         self._id += 1
-        unit.position = position
+        self.store.add(unit, team_id)
         unit.board = self
-        try:
-            unit.img = pygame.image.load("imgs/%s.png" % unit.name)
-            unit.img = pygame.transform.scale(unit.img, (128, 128))
-        except:
-            unit.img = None
+        unit.position = position
+        unit.start_time = self.now()
+        self._occupancy[unit.position] = unit
+        self._occupancy_version += 1
+        self._index_unit(unit)
+        if self.renderer:
+            self.renderer.load_unit_img(unit)
+        if self.recorder:
+            self.recorder.spawn(unit)
+        if self.profiler:
+            self.profiler.instrument_unit(unit)
 
         ## TODO: reset stats like hp
 
         self.units.add(unit)
         self.teams[team_id].add(unit)
+        self._notify_change()
 
     def move_unit(self, unit, target_position):
+        if unit not in self.units:
+            # e.g. a pull landing on a unit that died in flight
+            return
         assert self.get_unit_at_pos(target_position) is None
+        self.release_reservation(unit)
+        other = self._reservations.get(target_position)
+        if other is not None:
+            # whoever planned to step here has to re-plan
+            self.release_reservation(other)
+
+        del self._occupancy[unit.position]
+        self._unindex_unit(unit)
         unit.position = target_position
+        self._occupancy[unit.position] = unit
+        self._occupancy_version += 1
+        self._index_unit(unit)
+        if self.recorder:
+            self.recorder.move(unit)
+        self._notify_change()
 
     def remove_unit(self, unit):
         team_id = unit.team_id
         position = unit.position
         self.units.remove(unit)
         self.teams[team_id].remove(unit)
+        self.store.alive[unit._slot] = False
+        if self._occupancy.get(position) is unit:
+            del self._occupancy[position]
+        self._occupancy_version += 1
+        self._unindex_unit(unit)
+        self.release_reservation(unit)
+
+        # whoever was hitting this unit needs a new target; wake them in
+        # id order so they resume in the same order on every run
+        for other in sorted(self.units, key=lambda u: u._id):
+            if other.target is unit:
+                other.wake()
+        self._notify_change()
 
         if len(self.teams[team_id]) == 0:
             self.isGameActive = False
+            self._game_over.set()
+
+
+    def _index_unit(self, unit):
+        if unit.hex_id is None:
+            self._team_offgrid[unit.team_id].add(unit)
+        else:
+            self._team_hexes[unit.team_id][unit.hex_id] = unit
 
+    def _unindex_unit(self, unit):
+        self._team_offgrid[unit.team_id].discard(unit)
+        hexes = self._team_hexes[unit.team_id]
+        if hexes.get(unit.hex_id) is unit:
+            del hexes[unit.hex_id]
 
     def closest_unit(self, unit, filter_func='enemy', getFarthest=False):
         '''
         @filter_func: function or one of 'enemy', 'ally', 'all'
         @getFarthest: if True, then get farthest unit instead
+
+        ties are broken by id. the named filters walk the hex rings around
+        @unit through the per-team index and stop at the first ring with
+        a candidate, so the cost doesn't grow with team size
         '''
+        if filter_func == 'enemy':
+            teams = (1 - unit.team_id,)
+        elif filter_func == 'ally':
+            teams = (unit.team_id,)
+        elif filter_func == 'all':
+            teams = (0, 1)
+        else:
+            teams = None
+
+        if (teams is not None and unit.hex_id is not None
+                and not any(self._team_offgrid[t] for t in teams)):
+            indexes = [self._team_hexes[t] for t in teams]
+            if sum(len(index) for index in indexes) <= self.TARGET_SCAN_LIMIT:
+                # a handful of candidates, cheaper to just check them all
+                distances = self.grid.distances
+                row = unit.hex_id * self.grid.size
+                sign = -1 if getFarthest else 1
+                best = None
+                best_key = None
+                for index in indexes:
+                    for hex_id, other in index.items():
+                        if other is unit:
+                            continue
+                        key = (sign * distances[row + hex_id], other._id)
+                        if best is None or key < best_key:
+                            best = other
+                            best_key = key
+                return best
+
+            rings = self.grid.rings[unit.hex_id]
+            for ring in (reversed(rings) if getFarthest else rings):
+                best = None
+                for index in indexes:
+                    for hex_id in ring:
+                        other = index.get(hex_id)
+                        if (other is not None and other is not unit
+                                and (best is None or other._id < best._id)):
+                            best = other
+                if best is not None:
+                    return best
+            return None
+
+        return self._closest_unit_scan(unit, filter_func, getFarthest)
+
+    def _closest_unit_scan(self, unit, filter_func, getFarthest):
+        ''' closest_unit by checking every unit, for custom filters '''
         if filter_func == 'enemy':
             filter_func = lambda u: u.team_id != unit.team_id
         elif filter_func == 'ally':
@@ -283,15 +677,21 @@ class Board:
         if len(possible_units) == 0:
             return None
 
+        # break distance ties by id so targeting doesn't depend on set order
         dist_multiplier = 1 if not getFarthest else -1
         return min(possible_units, 
-                   key=lambda other: dist_multiplier * 
-                        doublewidth_distance(unit.position, other.position))
+                   key=lambda other: (dist_multiplier * 
+                        self.unit_distance(unit, other),
+                        other._id))
 
     def get_closest_empty_hex(self, position):
-        empty_spaces = set(self.spaces) - set(tuple(u.position) for u in self.units)
+        empty_spaces = [pos for pos in self.spaces if self.is_free(pos)]
+        if not empty_spaces:
+            # everything left is reserved, an unoccupied hex still works
+            empty_spaces = [pos for pos in self.spaces
+                            if pos not in self._occupancy]
         return min(empty_spaces,
-                   key=lambda other: doublewidth_distance(position, other))
+                   key=lambda other: self.distance(position, other))
 
 
     def get_hex_center_euc(self, pos):
@@ -314,109 +714,57 @@ class Board:
 
 
 
-    def draw_background(self):
-        self.screen.fill(BLACK)
-
-        for (c, r) in self.spaces:
-            pygame.draw.lines(self.screen, (255, 0, 0), True,
-                              self.get_hex_corners_euc((c, r)))
-
-
     async def battle(self):
         self.isGameActive = True
+        if self.recorder:
+            self.recorder.keyframe()
         self.tasks = [asyncio.ensure_future(unit.loop())
-                      for unit in self.units] #+ [
+                      for unit in sorted(self.units, key=lambda u: u._id)] + [
+                      asyncio.ensure_future(self.run_projectiles())] #+ [
                       #asyncio.ensure_future(self.print_board())]
 
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: sys.exit()
-
-            self.draw_background()
-
-            # draw raw img first
-            for unit in self.units:
-                if not unit.img:
-                    continue
-
-                x, y = self.get_hex_center_euc(unit.position)
-                rect = unit.img.get_rect()
-                rect.center = x, y
-                unit.img_rect = rect
-                
-                # align the Surface img to the hex center
-                self.screen.blit(unit.img, rect)
-
-
-            # draw hp & mana bars on top
-            for unit in self.units:
-                if not unit.img:
-                    continue
-
-                x, y = self.get_hex_center_euc(unit.position)
-                width = unit.img.get_width()
-                topleftx = x - width/2
-                toplefty = y - unit.img.get_height()/2
-
-                # draw hp bar, with shield
-                pygame.draw.rect(self.screen, WHITE, 
-                                 (topleftx, toplefty - 50, width, 20))
-                pygame.draw.rect(self.screen, RED, 
-                                 (topleftx, toplefty - 50, 
-                                  (unit.max_hp / (unit.max_hp + unit.total_shield)) * width, 20))
-                pygame.draw.rect(self.screen, GREEN, 
-                                 (topleftx, toplefty - 50, 
-                                  (unit.hp / (unit.max_hp + unit.total_shield)) * width, 20))
-                hptext = font.render("HP: %d/%d+%d" % (unit.hp, unit.max_hp, unit.total_shield), 1, BLACK)
-                self.screen.blit(hptext, (topleftx, toplefty - 50))
-
-                # draw mana bar
-                pygame.draw.rect(self.screen, DARKBLUE, 
-                                 (topleftx, toplefty - 30, width, 20))
-                pygame.draw.rect(self.screen, BLUE, 
-                                 (topleftx, toplefty - 30, 
-                                 ((unit.mana / unit.max_mana)
-                                  if unit.max_mana > 0 else 0) * width, 20))
-                manatext = font.render("MP: %d/%d" % (unit.mana, unit.max_mana), 1, BLACK)
-                self.screen.blit(manatext, (topleftx, toplefty - 30))
-
-
-            for p in self.get_projectiles():
-                p.update()
-                self.screen.blit(p.surf, p.rect)
-                if p.atDestination:
-                    self.projectiles.remove(p)
-
-
             if not self.isGameActive: 
                 if self.resolvingGameTask is None: # only run once
                     self.resolvingGameTask = asyncio.create_task(self.resolve_game())
-                    
 
-                endGameText = font.render("Round over", 1, WHITE)
-                self.screen.blit(endGameText, (300, 300))
-                
 
-            pygame.display.flip()
-            await self.sleep(0.25)
+            if self.renderer:
+                self.renderer.draw()
+                # frame rate is in wall-clock time, whatever the speed
+                await self.sleep(self.speed / self.renderer.FPS)
+            elif self.isGameActive:
+                await self._game_over.wait()
+            else:
+                # resolve_game cancels us once it's done
+                await asyncio.shield(self.resolvingGameTask)
+                return
 
 
 
     async def start_game(self, timeout=45):
+        self.loop = asyncio.get_running_loop()
+        self._loop_start = self.loop.time()
+        self.effects.arm()
         self.gameLoopTask = asyncio.create_task(self.battle())
         try:
             await asyncio.wait_for(self.gameLoopTask, timeout=timeout / self.speed)
         except asyncio.TimeoutError:
-            print('timeout!')
+            self.log('timeout!', level=INFO)
             if self.resolvingGameTask is None:
                 self.resolvingGameTask = asyncio.create_task(self.resolve_game())
 
             await self.resolvingGameTask
 
         except asyncio.CancelledError:
-            print('normal end')
-            pass
-            
+            self.log('normal end', level=INFO)
+
+        finally:
+            # even if the fight blew up, keep the log up to that point
+            self.logger.flush()
+
+        if self.recorder:
+            self.recorder.finish()
 
 
     async def print_board(self):
@@ -448,6 +796,10 @@ class Board:
                 for unit in team:
                     dmg[other_team] += unit.star
 
+        if True in won:
+            self.winner = won.index(True)
+        self.damage = dmg
+
         for team_id in range(len(self.teams)):
             self.players[team_id].take_damage(dmg[team_id])
 
@@ -1,8 +1,15 @@
 import time
 import asyncio
+import heapq
 import json
+import os
+import pickle
 from enum import Enum
+from types import MappingProxyType
 
+import combat_log
+from combat_log import DEBUG, INFO, WARNING
+from effects import Shield
 from hex_utils import (doublewidth_distance, 
                       doublewidth_round,
                       Position)
@@ -10,6 +17,11 @@ from projectile import Projectile
 
 # TODO: enum types for e.g. team, traits
 
+STATS_FILE = 'championStats.json'
+# bump whenever load_champion_stats_table or ChampionStats change what
+# ends up in the pickled table, so old caches get rebuilt
+CACHE_VERSION = 1
+
 class ChampionStats:
     def __init__(self, stats):
         self.damage = stats["offense"]["damage"]
@@ -27,12 +39,12 @@ class ChampionStats:
         return str(self.__dict__)
 
 
-def load_champion_stats_table(set_name="set3"):
+def load_champion_stats_table(set_name="set3", path=STATS_FILE):
     '''
     up-to-date
     https://blitz-cdn-plain.blitz.gg/blitz/tft/data-sets/champions.json
     '''
-    with open('championStats.json') as f:
+    with open(path) as f:
         data = json.load(f)
 
     assert 'Ahri' in data
@@ -69,40 +81,89 @@ def load_champion_stats_table(set_name="set3"):
     return filtered_data
 
 
+def cached_champion_stats_table(set_name="set3", path=STATS_FILE):
+    '''
+    load_champion_stats_table, compiled into a pickle next to the json
+
+    the cache is keyed on CACHE_VERSION and the json's mtime and size,
+    so changing the parsing or editing / re-fetching the json rebuilds
+    it on the next load
+    '''
+    st = os.stat(path)
+    key = (CACHE_VERSION, set_name, st.st_mtime_ns, st.st_size)
+    cache_path = '%s.%s.cache' % (path, set_name)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, table = pickle.load(f)
+        if cached_key == key:
+            return table
+    except Exception:
+        # missing, stale format or corrupt; just rebuild it
+        pass
+
+    table = load_champion_stats_table(set_name, path)
+    try:
+        tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, table), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # read-only checkout, we'll parse again next time
+
+    return table
+
+
 class Unit:
     star_multiplier = [0.5, 1, 1.8, 3.6]
     MANA_PER_ATK = 10
     MAX_MANA_FROM_DMG = 50
     MANA_PER_DMG = 0.1
-    stats_table = load_champion_stats_table()
+    stats_table = None  # loaded on first from_name, see get_stats_table
+
+    _prototypes = {}  # champion name -> prototype unit, see prototype
 
     def __init__(self, name='', 
                  stats=None,
                  star = 1,
                  position=(-1, -1),
-                 logfile=None,
                  **kwargs):
         self.name = name
-        self.stats = stats
-        self._ap = 0
-        self.target = None
+        self._stats = stats
         self._position = Position(*position)
-        self.star = int(star)
-        self._id = None
-        self.board = None
-        self.start_time = time.perf_counter()
-        self.logfile = logfile
+        self._star = int(star)
         self.traits = set()
-        self.status = []
-        self.team_id = None
-        self.shields = []
-        # CR-soon: write self to logfile
+        self._store = None
 
         for key, value in kwargs.items():
             setattr(self, key, value)
-            print(key, value)
 
-        self.mana = self.ability['manaStart']
+        self.reset()
+
+    def reset(self):
+        ''' (re)initialize everything a unit changes during a fight '''
+        self._ap = 0
+        self.target = None
+        self.hex_id = None  # index into board.grid, None when off the board
+        self.reserved_hex = None  # next step we claimed on the board
+        self._id = None
+        self.board = None
+        self.start_time = time.perf_counter()
+        self.team_id = None
+        self.effects = set()  # active effects.Effect on this unit
+        self.modifiers = {}  # stat -> bonus from buffs, debuffs & items
+        self._shields = []  # heap of (expiry, seq, effects.Shield)
+        self._stuns = 0
+        self._wakeup = asyncio.Event()  # see loop & wake
+        self.img = None  # set by the board's renderer, if any
+        self.recompute_stats()
+
+        # hp, mana, etc. are plain attributes until a board moves them
+        # into a row of its UnitStore
+        self._store = None
+        self._slot = None
+        self._shield = 0
+        self._mana = self.ability['manaStart']
         self._max_mana = self.ability['manaCost']
         self._hp = self.max_hp
         self.is_targetable = True
@@ -113,83 +174,165 @@ class Unit:
 
 
     @classmethod
-    def from_name(cls, name, **kwargs):
-        if name not in cls.stats_table:
+    def get_stats_table(cls):
+        if Unit.stats_table is None:
+            Unit.stats_table = cached_champion_stats_table()
+        return Unit.stats_table
+
+    @classmethod
+    def prototype(cls, name):
+        '''
+        read-only template unit for champion @name, built once
+
+        its champion data is frozen, so every unit spawned from it can
+        share that data while owning its own fight state
+        '''
+        proto = Unit._prototypes.get(name)
+        if proto is not None:
+            return proto
+
+        stats_table = cls.get_stats_table()
+        if name not in stats_table:
             raise NameError(f'{name} not found')
 
-        attributes = cls.stats_table[name]
-        attributes["name"] = name
+        attributes = dict(stats_table[name])
+        ability = attributes['ability']
+        attributes['ability'] = MappingProxyType({
+            **ability,
+            'stats': MappingProxyType({k: tuple(v) for k, v
+                                       in ability['stats'].items()})})
+        attributes['traits'] = tuple(attributes['traits'])
+        attributes['items'] = tuple(attributes['items'])
 
         # get unique champion class if exists, for defining abilities
-        champion_cls = globals().get(name, cls)
-        print(f'loaded {name} as {champion_cls}')
-        # merge the two dictionaries, allow kwargs overwrite
-        return champion_cls(**{**attributes, **kwargs})
+        champion_cls = globals().get(name, Unit)
+        proto = champion_cls(name=name, **attributes)
+        Unit._prototypes[name] = proto
+        return proto
 
+    @classmethod
+    def from_name(cls, name, **kwargs):
+        ''' spawn a fresh unit of champion @name, kwargs overwrite attributes '''
+        return cls.prototype(name).spawn(**kwargs)
 
-    @property
-    def SPELL_DMG(self):
-        return self.ability["stats"].get("Damage", [0, 0, 0])[self.star - 1]
-    
-    @property
-    def SPELL_ATTACK_DMG(self):
-        return self.ability["stats"].get("Attack Damage", [0, 0, 0])[self.star - 1]
-    
-    @property
-    def SPELL_SHIELD(self):
-        return self.ability["stats"].get("Shield", [0, 0, 0])[self.star - 1]
-    
+    def spawn(self, **kwargs):
+        ''' cheap clone of this (prototype) unit with its own fight state '''
+        unit = object.__new__(self.__class__)
+        unit.__dict__.update(self.__dict__)
+        unit.items = list(self.items)
+        unit._store = None  # not on a board yet, see reset()
 
-    @property
-    def time_alive(self):
-        return time.perf_counter() - self.start_time
+        for key, value in kwargs.items():
+            setattr(unit, key, value)
+
+        unit.reset()
+        return unit
+
+
+    def recompute_stats(self):
+        '''
+        combine base stats, star level & modifiers into the plain
+        attributes the fight reads (ad, armor, max_hp, SPELL_DMG, ...)
+
+        setting star or stats, or going through add_modifier, calls this;
+        anything else that changes them has to call it too
+        '''
+        stats = self._stats
+        star = self._star
+        modifiers = self.modifiers
+        multiplier = self.star_multiplier[star]
+
+        self.ad = stats.damage * multiplier + modifiers.get('ad', 0)
+        self.atspd = stats.attackSpeed + modifiers.get('atspd', 0)
+        self.armor = stats.armor + modifiers.get('armor', 0)
+        self.mr = stats.magicResist + modifiers.get('mr', 0)
+        self.max_hp = stats.health * multiplier + modifiers.get('max_hp', 0)
+        self.range = stats.range + modifiers.get('range', 0)
+        self.ap = self._ap + modifiers.get('ap', 0)
+
+        spell_stats = self.ability['stats']
+        self.SPELL_DMG = spell_stats.get('Damage', (0, 0, 0))[star - 1]
+        self.SPELL_ATTACK_DMG = spell_stats.get('Attack Damage', (0, 0, 0))[star - 1]
+        self.SPELL_SHIELD = spell_stats.get('Shield', (0, 0, 0))[star - 1]
+
+    def add_modifier(self, stat, amount):
+        ''' add @amount to @stat, negative to take a bonus back '''
+        self.modifiers[stat] = self.modifiers.get(stat, 0) + amount
+        self.recompute_stats()
 
     @property
-    def ad(self):
-        return (self.stats.damage
-               * self.star_multiplier[self.star])
-    
-    @property
-    def atspd(self):
-        return self.stats.attackSpeed
-    
-    @property
-    def armor(self):
-        return self.stats.armor
-    
-    @property
-    def mr(self):
-        return self.stats.magicResist
+    def star(self):
+        return self._star
+
+    @star.setter
+    def star(self, star):
+        self._star = int(star)
+        self.recompute_stats()
 
     @property
-    def max_hp(self):
-        return (self.stats.health
-                * self.star_multiplier[self.star])
+    def stats(self):
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats):
+        self._stats = stats
+        self.recompute_stats()
 
     @property
-    def range(self):
-        return self.stats.range
-    
+    def time_alive(self):
+        return self.now() - self.start_time
+
     @property
     def hp(self):
-        return self._hp
+        store = self._store
+        if store is None:
+            return self._hp
+        return store.hp[self._slot]
+
+    @hp.setter
+    def hp(self, hp):
+        store = self._store
+        if store is None:
+            self._hp = hp
+        else:
+            store.hp[self._slot] = hp
+        if hp < 0:
+            self.wake()
     
-    @property
-    def ap(self):
-        return self._ap
-
     @property
     def mana(self):
-        return self._mana
+        store = self._store
+        if store is None:
+            return self._mana
+        return store.mana[self._slot]
 
     @mana.setter
     def mana(self, mana):
         # TODO: check mana_lock
-        self._mana = mana
+        store = self._store
+        if store is None:
+            self._mana = mana
+            max_mana = self._max_mana
+        else:
+            store.mana[self._slot] = mana
+            max_mana = store.max_mana[self._slot]
+        if mana >= max_mana and max_mana > 0:
+            self.wake()
     
     @property
     def max_mana(self):
-        return self._max_mana
+        store = self._store
+        if store is None:
+            return self._max_mana
+        return store.max_mana[self._slot]
+
+    @max_mana.setter
+    def max_mana(self, max_mana):
+        store = self._store
+        if store is None:
+            self._max_mana = max_mana
+        else:
+            store.max_mana[self._slot] = max_mana
 
     @property
     def mana_per_atk(self):
@@ -198,7 +341,22 @@ class Unit:
 
     @property
     def total_shield(self):
-        return sum([s[1] for s in self.shields])
+        store = self._store
+        if store is None:
+            return self._shield
+        return store.shield[self._slot]
+
+    @total_shield.setter
+    def total_shield(self, total):
+        store = self._store
+        if store is None:
+            self._shield = total
+        else:
+            store.shield[self._slot] = total
+
+    @property
+    def is_stunned(self):
+        return self._stuns > 0
     
     @property
     def is_ranged(self):
@@ -210,7 +368,14 @@ class Unit:
     
     @position.setter
     def position(self, position):
-        self._position = Position(*position)
+        if position.__class__ is not Position:
+            position = Position(*position)
+        self._position = position
+        store = self._store
+        if store is not None:
+            store.x[self._slot], store.y[self._slot] = position
+        if self.board:
+            self.hex_id = self.board.grid.hex_id.get(self._position)
 
     def __repr__(self):
         return (f"[{self.name} @{self.position}] HP:{self.hp}/{self.max_hp},"
@@ -223,6 +388,12 @@ class Unit:
     @property
     def speed(self):
         return self.board.speed
+
+    def now(self):
+        ''' game clock of our board; wall clock before we're placed '''
+        if self.board:
+            return self.board.now()
+        return time.perf_counter()
     
 
     async def sleep(self, time):
@@ -244,26 +415,33 @@ class Unit:
 
     def launch_autoattack(self, target):
         res = self.deal_damage(self.target, self.ad, 'physical', is_autoattack=True)
-        self._mana += self.mana_per_atk
+        self.mana += self.mana_per_atk
+        if self.board.recorder:
+            self.board.recorder.mana(self)
         return res
         
 
     async def autoattack(self):
         await self.sleep(0.5 / self.atspd)
-        while not self.target:
-            self.acquire_target()
-            await self.sleep(0.1)
+        while self.acquire_target() is None:
+            # nobody to hit right now, try again once the board changes
+            await self.board.wait_for_change()
 
         # walk until in range
-        dist = doublewidth_distance(self.position, 
-                                   self.target.position)
+        dist = self.board.unit_distance(self, self.target)
         while dist > self.range:
             self.board.search_path(self, self.target)
             await self.sleep(1)
-            dist = doublewidth_distance(self.position, 
-                   self.target.position)
+            if self.acquire_target() is None:
+                # the last enemy died while we walked
+                return None
+            dist = self.board.unit_distance(self, self.target)
+
+        # in range, done pathing; don't keep blocking our planned next step
+        if self.reserved_hex is not None:
+            self.board.release_reservation(self)
 
-        self.log(f'atk -> {self.target}')
+        self.log('atk -> %s', self.target)
         res = self.launch_autoattack(self.target)
         await self.sleep(0.5 / self.atspd)
         return res
@@ -279,11 +457,13 @@ class Unit:
     async def cast_spell(self):
         if self.max_mana == 0:
             return
-        self.log(f"casting {self.ability['description']}...")
+        self.log('casting %s...', self.ability['description'])
+        if self.board.recorder:
+            self.board.recorder.cast(self)
         await self.spell_effect()
 
     async def spell_effect(self):
-        print(f'{self} ultimate not implemented')
+        self.log('ultimate not implemented', level=WARNING)
         pass
 
 
@@ -291,50 +471,36 @@ class Unit:
         if duration == -1:
             duration = 100
 
-        _id = time.perf_counter()
-        self.shields.append([time.perf_counter() + duration, amount, _id])
-        self.shields.sort(key=lambda x: x[0])
-        
-        # remove shields after expiration
-        def remove_shield():
-            for s in self.shields:
-                if s[2] == _id:
-                    self.shields.remove(s)
-                    return
-
-        loop = asyncio.get_event_loop()
-        loop.call_later(duration / self.speed, remove_shield)
+        return self.board.effects.add(Shield(self, amount, duration, source=self))
 
 
     def launch_projectile(self, target, speed, start=None,
                           dmg=0, dmg_type='magical', 
                           special_collision_func=None,
                           ending_func=None):
+        ''' @target, @start: board positions; @speed: hexes per second '''
         if start is None:
             start = self.position
 
-        start_euc = self.board.get_hex_center_euc(start)
-        end_euc = self.board.get_hex_center_euc(target)
+        if self.board.recorder:
+            self.board.recorder.projectile(self, start, target, speed)
 
         def collision_func(unit):
-            print("projectile colliding on ",
-                  unit.name, 
-                  "from ", self.name)
+            self.log('projectile colliding on %s', unit, level=DEBUG)
             if unit.team_id != self.team_id:
                 self.deal_damage(unit, dmg, dmg_type)
             if special_collision_func:
                 special_collision_func(unit)
 
-        self.board.projectiles.add(
-            Projectile(self, start_euc, end_euc, speed, 
-                       img='imgs/%s_ability.png' % self.name,
+        self.board.add_projectile(
+            Projectile(self, start, target, speed,
                        collision_func=collision_func,
                        ending_func=ending_func))
 
 
     def receive_damage(self, dmg, source, dmg_type, is_autoattack=False):
         mana_gained = min(self.MAX_MANA_FROM_DMG, int(dmg * self.MANA_PER_DMG))
-        self._mana += mana_gained
+        self.mana += mana_gained
 
         if dmg_type == 'physical':
             dmg *= (1 - self.armor / (100 + self.armor))
@@ -346,69 +512,104 @@ class Unit:
 
     def on_damage(self, dmg, source, dmg_type, is_autoattack=False):
         dmg = int(dmg)
-        self.log('%d dmg [%s] from [%s]' % (dmg, dmg_type, source))
-
-        for i, s in enumerate(self.shields):
-            amount = s[1]
-            if amount > dmg:
-                self.shields[i][1] -= dmg
-                self.shields = self.shields[i:]  # remove previously broken shields
-                return (True, dmg)
-
-            # cut through current shield and continue
-            dmg -= amount
-
-        self.shields = []
-        self._hp -= dmg
+        self.log('%d dmg [%s] from [%s]', dmg, dmg_type, source)
+
+        raw_dmg = dmg
+        shields = self._shields
+        while dmg > 0 and shields:
+            shield = shields[0][2]
+            if not shield.active:
+                heapq.heappop(shields)
+            elif shield.amount > dmg:
+                shield.amount -= dmg
+                self.total_shield -= dmg
+                dmg = 0
+            else:
+                # cut through current shield and continue
+                dmg -= shield.amount
+                heapq.heappop(shields)
+                self.board.effects.remove(shield)
+        self.hp -= dmg
+
+        if self.board and self.board.recorder:
+            self.board.recorder.damage(self, source, dmg_type, raw_dmg)
         
         return (True, dmg)
 
 
-    def log(self, msg):
-        logstr = '(%f)[%s %s] %s' % (self.time_alive, 
-                                  self.name, self._id, msg)
+    @property
+    def logger(self):
+        if self.board:
+            return self.board.logger
+        return combat_log.default_logger
 
-        if self.logfile:
-            self.logfile.write(logstr + '\n')
-        else:
-            print(logstr)
+    def log(self, msg, *args, level=INFO):
+        ''' @msg is %-formatted with @args only if the event gets written '''
+        logger = self.logger
+        if level >= logger.level:
+            logger.record(level, self.time_alive, self.name, self._id,
+                          msg, args)
 
     def death(self):
         self.log('died')
+        if self.board.recorder:
+            self.board.recorder.death(self)
         self.is_targetable = False
-        # TODO: clear all tasks and effects
+        self.board.effects.clear_unit(self)
         self.board.remove_unit(self)
 
 
 
+    def wake(self):
+        ''' have loop() look at this unit's state again '''
+        self._wakeup.set()
+
     async def loop(self):
-        # make a list of tasks, including status and queued effects
-        # check for things like am i stunned? did i just cast (and thus can't gain mana)?
-        auto_task = asyncio.ensure_future(self.autoattack())
+        '''
+        reacts to whatever woke it: hp dropping below 0, mana filling up,
+        an attack finishing, the target dying or a stun starting/ending;
+        otherwise it sleeps, there's no polling
+        '''
+        wakeup = self._wakeup
+        auto_task = None
         spell_task = None
 
-        while True:
-            if self.hp < 0:
-                auto_task.cancel()
-                if spell_task:
-                    spell_task.cancel()
-                self.death()
-                return
+        try:
+            while True:
+                wakeup.clear()
+                if self.hp < 0:
+                    if auto_task:
+                        auto_task.cancel()
+                    if spell_task:
+                        spell_task.cancel()
+                    self.death()
+                    return
 
-            ## TODO: deal w/ status e.g. stunned
-            # can we make this a closed set? e.g. burn effects, is_stunned, etc
+                if self.is_stunned:
+                    # interrupts the attack in progress; no attacking or
+                    # casting until the stun wears off
+                    if auto_task and not auto_task.done():
+                        auto_task.cancel()
+                    await wakeup.wait()
+                    continue
 
-            if self.mana >= self.max_mana:
-                self.mana = 0
-                spell_task = asyncio.ensure_future(self.cast_spell())
-                # non-blocking for now
+                if self.max_mana > 0 and self.mana >= self.max_mana:
+                    self.mana = 0
+                    spell_task = asyncio.ensure_future(self.cast_spell())
+                    # non-blocking for now
 
-            self.acquire_target()
-        
-            if auto_task.done():
-                auto_task = asyncio.ensure_future(self.autoattack())
-            await self.sleep(0.03)
+                self.acquire_target()
 
+                if auto_task is None or auto_task.done():
+                    auto_task = asyncio.ensure_future(self.autoattack())
+                    auto_task.add_done_callback(lambda _: self.wake())
+                await wakeup.wait()
+        finally:
+            # don't leave an attack or spell running without us, e.g.
+            # when the board cancels every loop at the end of the round
+            for task in (auto_task, spell_task):
+                if task is not None and not task.done():
+                    task.cancel()
 
 
 
@@ -426,7 +627,7 @@ class Ahri(Unit):
         else:
             proj_dir = Position(0.5, 0.5)
 
-        proj_speed = 90
+        proj_speed = 2  # hexes per second
         proj_length = 6
 
         # draw line through proj_dir 
@@ -461,13 +662,13 @@ class Poppy(Unit):
 class Jayce(Unit):
     async def spell_effect(self):
         if self.target:
-            dist = doublewidth_distance(self.position, self.target.position)
+            dist = self.board.unit_distance(self, self.target)
             aim_center = self.position  # default in case weird stuff happens
 
             # the hex in the direction of our target should have less distance
             for neighbor in self.board._neighbors:
                 pos = self.position + neighbor
-                if doublewidth_distance(pos, self.target.position) < dist:
+                if self.board.distance(pos, self.target.position) < dist:
                     aim_center = pos
                     break
 
@@ -476,21 +677,21 @@ class Jayce(Unit):
             aim_center = self.position + (1, 1)
 
         await self.sleep(0.25)
-        for target in self.board.circle_range(aim_center, radius=1):
-            if target.team_id != self.team_id:
-                self.deal_damage(target, self.SPELL_DMG, 'magical')
+        for target in self.board.circle_range(aim_center, radius=1,
+                                              exclude_team=self.team_id):
+            self.deal_damage(target, self.SPELL_DMG, 'magical')
 
 
 class Annie(Unit):
     async def spell_effect(self):
         if self.target:
-            dist = doublewidth_distance(self.position, self.target.position)
+            dist = self.board.unit_distance(self, self.target)
             left_cone_edge = self.position  # default in case weird stuff happens
 
             # the hex in the direction of our target should have less distance
             for neighbor in self.board._neighbors:
                 pos = self.position + neighbor
-                if doublewidth_distance(pos, self.target.position) < dist:
+                if self.board.distance(pos, self.target.position) < dist:
                     left_cone_edge = pos
                     break
 
@@ -499,9 +700,9 @@ class Annie(Unit):
             left_cone_edge = self.position + (1, 1)
 
         await self.sleep(0.25)
-        for target in self.board.cone_range(self.position, left_cone_edge, span=1, length=3):
-            if target.team_id != self.team_id:
-                self.deal_damage(target, self.SPELL_DMG, 'magical')
+        for target in self.board.cone_range(self.position, left_cone_edge, span=1, length=3,
+                                            exclude_team=self.team_id):
+            self.deal_damage(target, self.SPELL_DMG, 'magical')
 
         self.shield(self.SPELL_SHIELD)
 
@@ -516,7 +717,7 @@ class Blitzcrank(Unit):
         # find farthest unit
         farthest_unit = self.board.closest_unit(self, getFarthest=True)
         start_location = self.position
-        proj_speed = 600
+        proj_speed = 14  # hexes per second
 
         def pull(proj):
             self.deal_damage(farthest_unit, self.SPELL_DMG, 'magical')
@@ -0,0 +1,86 @@
+import atexit
+import datetime
+import sys
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+
+class CombatLogger:
+    '''
+    leveled, buffered combat log
+
+    events are stored as (time, level, name, id, msg, args) tuples in a
+    preallocated ring buffer and only %-formatted when the buffer is
+    flushed in bulk to @logfile (stdout when None); check
+    is_enabled(level) before doing any work to build a message
+    '''
+    def __init__(self, level=INFO, logfile=None, capacity=4096):
+        self.level = level
+        self.logfile = logfile
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self._next = 0  # write index
+        self._count = 0
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def record(self, level, time, name, _id, msg, args=()):
+        if level < self.level:
+            return
+
+        self._buffer[self._next] = (time, level, name, _id, msg, args)
+        self._next += 1
+        if self._next == self.capacity:
+            self._next = 0
+        self._count += 1
+        if self._count == self.capacity:
+            self.flush()
+
+    def events(self):
+        ''' buffered (not yet flushed) events, oldest first '''
+        start = (self._next - self._count) % self.capacity
+        return [self._buffer[(start + i) % self.capacity]
+                for i in range(self._count)]
+
+    @staticmethod
+    def format_event(event):
+        time, level, name, _id, msg, args = event
+        if args:
+            msg = msg % args
+        if _id is None:
+            return '(%f)[%s] %s' % (time, name, msg)
+        return '(%f)[%s %s] %s' % (time, name, _id, msg)
+
+    def flush(self):
+        if not self._count:
+            return
+        lines = [self.format_event(e) for e in self.events()]
+        logfile = self.logfile if self.logfile is not None else sys.stdout
+        logfile.write('\n'.join(lines) + '\n')
+        self._next = 0
+        self._count = 0
+
+    def close(self):
+        self.flush()
+        if self.logfile is not None:
+            self.logfile.close()
+
+
+def daily_combat_log(level=INFO):
+    ''' logger appending to today's combat_log_<date> file '''
+    logfile = open('combat_log_%s' % datetime.datetime.now().strftime('%Y_%m_%d'), 'a')
+    logfile.write(str(datetime.datetime.now()))
+    logfile.write('\n\n')
+    logger = CombatLogger(level, logfile)
+    # same as default_logger: don't lose what's still buffered on exit
+    atexit.register(logger.flush)
+    return logger
+
+
+# for units that aren't on a board yet
+default_logger = CombatLogger()
+atexit.register(default_logger.flush)
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from board import Board
+from champions import Unit
+from combat_log import CombatLogger, OFF
+from player import Player
+
+
+CHAMPIONS = ['Ahri', 'Annie', 'Blitzcrank', 'Jayce', 'Jhin', 'Poppy']
+
+
+@pytest.fixture
+def random_board():
+    '''
+    factory for headless, silent boards with sizes[team] units per team
+    on random hexes; @offgrid extra units (alternating teams) go on
+    positions that aren't hexes, like p2 units mirrored off the grid
+    '''
+    def make(sizes, seed, offgrid=0):
+        rng = random.Random(seed)
+        board = Board(Player(), Player(), headless=True,
+                      logger=CombatLogger(level=OFF))
+
+        hexes = rng.sample(board.spaces, sum(sizes))
+        teams = [team_id for team_id, size in enumerate(sizes)
+                 for _ in range(size)]
+        for team_id, position in zip(teams, hexes):
+            board.add_unit(Unit.from_name(rng.choice(CHAMPIONS)), team_id,
+                           position)
+
+        outside = [(x, y) for x in range(-1, Board.WIDTH + 2)
+                   for y in range(Board.HEIGHT + 1)
+                   if (x + y) % 2 == 0 and (x, y) not in board.grid.hex_id]
+        for i, position in enumerate(rng.sample(outside, offgrid)):
+            board.add_unit(Unit.from_name(rng.choice(CHAMPIONS)), i % 2,
+                           position)
+        return board
+    return make
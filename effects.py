@@ -0,0 +1,203 @@
+'''
+timed effects on units: shields, stat buffs & debuffs, damage over
+time and stuns
+
+every board owns one EffectScheduler; it keeps a single heap of
+(game time, effect) entries and a single timer on the board's clock,
+re-armed for whatever comes next, instead of a call_later per effect.
+effects removed early (a broken shield, a dead unit) just get marked
+inactive and their heap entries are skipped when they come up
+'''
+import heapq
+from itertools import count
+
+
+class Effect:
+    '''
+    something timed on @unit; apply() runs when it's added, expire()
+    when it runs out or gets removed early
+
+    @duration: game seconds, None to last until removed
+    @interval: if set, tick() runs every @interval game seconds
+    '''
+    interval = None
+
+    def __init__(self, unit, duration=None, source=None):
+        self.unit = unit
+        self.duration = duration
+        self.source = source
+        self.active = False
+        self.expires_at = None
+        self.seq = None
+
+    def apply(self):
+        pass
+
+    def expire(self):
+        pass
+
+    def tick(self):
+        pass
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self.unit)
+
+
+class Shield(Effect):
+    '''
+    absorbs damage before hp; Unit.on_damage eats through a unit's
+    shields soonest-expiring first
+    '''
+    def __init__(self, unit, amount, duration=None, source=None):
+        super().__init__(unit, duration, source)
+        self.amount = amount
+
+    def apply(self):
+        expires_at = self.expires_at if self.expires_at is not None else float('inf')
+        heapq.heappush(self.unit._shields, (expires_at, self.seq, self))
+        self.unit.total_shield += self.amount
+        self._record()
+
+    def expire(self):
+        self.unit.total_shield -= self.amount
+        self.amount = 0
+        self._record()
+
+    def _record(self):
+        board = self.unit.board
+        if board and board.recorder:
+            board.recorder.shield(self.unit)
+
+
+class StatModifier(Effect):
+    '''
+    buff (or debuff, with a negative @amount) to one of the unit's
+    stats, e.g. StatModifier(unit, 'armor', 20, duration=4)
+    '''
+    def __init__(self, unit, stat, amount, duration=None, source=None):
+        super().__init__(unit, duration, source)
+        self.stat = stat
+        self.amount = amount
+
+    def apply(self):
+        self.unit.add_modifier(self.stat, self.amount)
+
+    def expire(self):
+        self.unit.add_modifier(self.stat, -self.amount)
+
+
+class DamageOverTime(Effect):
+    ''' @dmg every @interval game seconds, e.g. burns '''
+    def __init__(self, unit, dmg, duration, interval=0.5,
+                 dmg_type='magical', source=None):
+        super().__init__(unit, duration, source)
+        self.dmg = dmg
+        self.interval = interval
+        self.dmg_type = dmg_type
+
+    def tick(self):
+        if self.unit.is_targetable:
+            self.unit.receive_damage(self.dmg, self.source, self.dmg_type)
+
+
+class Stun(Effect):
+    ''' no attacks or casts while any stun is active '''
+    def apply(self):
+        self.unit._stuns += 1
+        self.unit.wake()
+
+    def expire(self):
+        self.unit._stuns -= 1
+        self.unit.wake()
+
+
+class EffectScheduler:
+    '''
+    runs the timed effects of one board on its game clock
+
+    adding or expiring an effect is a heap push/pop, O(log n)
+    '''
+    # ticks due at the same time as an expiry run first
+    _TICK = 0
+    _EXPIRE = 1
+
+    def __init__(self, board):
+        self.board = board
+        self._heap = []  # (game time, kind, seq, effect)
+        self._seq = count()
+        self._handle = None
+        self._armed_at = None
+
+    def add(self, effect):
+        now = self.board.now()
+        effect.seq = next(self._seq)
+        effect.active = True
+        effect.unit.effects.add(effect)
+        if effect.duration is not None:
+            effect.expires_at = now + effect.duration
+            self._push(effect.expires_at, self._EXPIRE, effect)
+        if effect.interval:
+            self._push(now + effect.interval, self._TICK, effect)
+
+        effect.apply()
+        return effect
+
+    def remove(self, effect):
+        ''' end @effect right away '''
+        if not effect.active:
+            return
+        effect.active = False
+        effect.unit.effects.discard(effect)
+        effect.expire()
+
+    def clear_unit(self, unit):
+        ''' remove every effect on @unit, e.g. when it dies '''
+        for effect in sorted(unit.effects, key=lambda e: e.seq):
+            self.remove(effect)
+
+    def _push(self, t, kind, effect):
+        heapq.heappush(self._heap, (t, kind, next(self._seq), effect))
+        if self._armed_at is None or t < self._armed_at:
+            self.arm()
+
+    def arm(self):
+        ''' (re)set the timer for the earliest pending entry '''
+        heap = self._heap
+        while heap and not heap[0][3].active:
+            heapq.heappop(heap)
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._armed_at = None
+        if not heap or self.board.loop is None:
+            return  # the board arms us again when the fight starts
+
+        self._armed_at = heap[0][0]
+        self._handle = self.board.call_at(self._armed_at, self._fire)
+
+    def _fire(self):
+        # go by the deadline we were armed for; board.now() rebuilds it
+        # from the loop clock & speed and can come out an ulp short
+        due = max(self._armed_at, self.board.now())
+        self._handle = None
+        self._armed_at = None
+
+        heap = self._heap
+        while heap and heap[0][0] <= due:
+            t, kind, _, effect = heapq.heappop(heap)
+            if not effect.active:
+                continue
+
+            if kind == self._EXPIRE:
+                self.remove(effect)
+                continue
+
+            effect.tick()
+            next_tick = t + effect.interval
+            if effect.active and (effect.expires_at is None
+                                  or next_tick <= effect.expires_at):
+                heapq.heappush(heap, (next_tick, self._TICK,
+                                      next(self._seq), effect))
+
+        self.arm()
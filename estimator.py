@@ -0,0 +1,121 @@
+'''
+closed-form fight estimates
+
+treats each team as one pool of effective hp being worn down at a
+steady rate, using the same numbers the engine does:
+
+    auto attacks    ad * atspd, mitigated by the enemy's average armor
+    spells          casts per second from mana gained per attack
+                    (MANA_PER_ATK) and per damage taken (MANA_PER_DMG),
+                    over max_mana; starting mana is an opening burst
+                    SPELL_DMG mitigated by the enemy's average mr,
+                    SPELL_SHIELD adds to our own pool at the same cadence
+
+so time-to-kill of the enemy team is
+
+    (enemy hp - our opening burst) / (our dps - enemy shield per second)
+
+no targeting, movement or spell shapes; good enough to spot lopsided
+matchups in microseconds, not to replace a simulation
+'''
+from collections import namedtuple
+from functools import lru_cache
+
+from champions import Unit
+
+
+Estimate = namedtuple('Estimate', ['winner', 'ttk', 'margin'])
+''' winner: team id predicted to win, None if neither kills the other in
+    time; ttk: seconds each team needs to kill the other (inf if never);
+    margin: 0 for a coin flip up to 1 for a sure thing '''
+
+
+def _mitigation(resist):
+    return 1 - resist / (100 + resist)
+
+
+_Profile = namedtuple('_Profile', [
+    'ad', 'atspd', 'armor', 'mr', 'hp', 'mana', 'max_mana', 'mana_per_atk',
+    'MANA_PER_DMG', 'SPELL_DMG', 'SPELL_SHIELD'])
+
+
+@lru_cache(maxsize=None)
+def _profile(name, star):
+    ''' the numbers we need from a fresh @name unit, as plain floats '''
+    unit = Unit.from_name(name, star=star)
+    return _Profile(*(float(getattr(unit, field)) for field in _Profile._fields))
+
+
+def _team_units(team):
+    return [_profile(name, star) for name, star, _ in team]
+
+
+def _team_stats(units, enemies):
+    ''' what @units do to @enemies: (dps, burst, shield rate, opening shield) '''
+    armor = sum(u.armor for u in enemies) / len(enemies)
+    mr = sum(u.mr for u in enemies) / len(enemies)
+
+    # raw damage coming in, spread over our units, feeds our mana
+    incoming = sum(u.ad * u.atspd for u in enemies) / len(units)
+
+    dps = burst = shield_rate = shield = 0
+    for u in units:
+        dps += u.ad * u.atspd * _mitigation(armor)
+        if u.max_mana <= 0:
+            continue
+
+        mana_rate = u.mana_per_atk * u.atspd + u.MANA_PER_DMG * incoming
+        casts_per_s = mana_rate / u.max_mana
+        opening_casts = u.mana // u.max_mana
+
+        spell = u.SPELL_DMG * _mitigation(mr)
+        dps += casts_per_s * spell
+        burst += opening_casts * spell
+        shield_rate += casts_per_s * u.SPELL_SHIELD
+        shield += opening_casts * u.SPELL_SHIELD
+
+    return dps, burst, shield_rate, shield
+
+
+def estimate(team1, team2, timeout=45):
+    '''
+    predict the fight between two team specs ((name, star, position)
+    lists, as runner takes them)
+    '''
+    units = (_team_units(team1), _team_units(team2))
+    if not units[0] or not units[1]:
+        winner = 0 if units[0] else (1 if units[1] else None)
+        return Estimate(winner, (0.0, 0.0), 1.0)
+
+    stats = (_team_stats(units[0], units[1]), _team_stats(units[1], units[0]))
+
+    ttk = []
+    for team_id in (0, 1):
+        dps, burst, _, _ = stats[team_id]
+        _, _, enemy_shield_rate, enemy_shield = stats[1 - team_id]
+        enemy_hp = sum(u.hp for u in units[1 - team_id]) + enemy_shield
+
+        net_dps = dps - enemy_shield_rate
+        remaining = enemy_hp - burst
+        if remaining <= 0:
+            ttk.append(0.0)
+        elif net_dps <= 0:
+            ttk.append(float('inf'))
+        else:
+            ttk.append(remaining / net_dps)
+
+    fast, slow = sorted(ttk)
+    if fast > timeout or fast == slow:
+        return Estimate(None, tuple(ttk), 0.0)
+
+    winner = ttk.index(fast)
+    margin = 1 - fast / min(slow, timeout) if slow > 0 else 0.0
+    return Estimate(winner, tuple(ttk), max(0.0, margin))
+
+
+def order_by_uncertainty(matchups, **kwargs):
+    '''
+    sort (team1, team2) pairs closest-call first, so a search spends its
+    simulations where the outcome is least obvious
+    '''
+    return sorted(matchups, key=lambda m: estimate(*m, **kwargs).margin)
@@ -1,39 +1,46 @@
 import math
+from functools import lru_cache
 
-class Position:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+class Position(tuple):
+    '''
+    immutable (x, y) pair
 
-    def __iter__(self):
-        yield self.x
-        yield self.y
+    a tuple underneath: hashing, ==, unpacking and indexing all run in C
+    and compare equal to plain tuples; positions of on-board hexes are
+    interned, see intern_positions
+    '''
+    __slots__ = ()
 
-    def __getitem__(self, key):
-        if not isinstance(key, int):
-            raise ValueError
-        if key < 0 or key > 2:
-            raise ValueError
-        return (self.x, self.y)[key]
+    def __new__(cls, x, y):
+        p = _interned.get((x, y))
+        if p is not None:
+            return p
+        return tuple.__new__(cls, (x, y))
+
+    def __getnewargs__(self):
+        return tuple(self)
 
-    def __eq__(self, other):
-        # compare against Position or tuples
-        return (self.x == other[0] and
-                self.y == other[1])
+    @property
+    def x(self):
+        return self[0]
 
-    def __hash__(self):
-        return (self.x, self.y).__hash__()
+    @property
+    def y(self):
+        return self[1]
 
+    def __repr__(self):
+        return 'Position(%r, %r)' % self
+
+    def __str__(self):
+        return '(%s, %s)' % self
+
+    # arithmetic is element-wise, unlike tuple's concatenation & repetition
     def __add__(self, other):
-        if isinstance(other, tuple):
-            return Position(self.x + other[0],
-                            self.y + other[1])
-        elif isinstance(other, int):
-            return Position(self.x + other,
-                            self.y + other)
-        elif isinstance(other, Position):
-            return Position(self.x + other.x,
-                            self.y + other.y)
+        cls = other.__class__
+        if cls is Position or cls is tuple:
+            return Position(self[0] + other[0], self[1] + other[1])
+        elif cls is int:
+            return Position(self[0] + other, self[1] + other)
         else:
             raise ValueError
 
@@ -41,31 +48,29 @@ class Position:
         return self.__add__(other)
 
     def __sub__(self, other):
-        if isinstance(other, tuple):
-            return Position(self.x - other[0],
-                            self.y - other[1])
-        elif isinstance(other, int):
-            return Position(self.x - other,
-                            self.y - other)
-        elif isinstance(other, Position):
-            return Position(self.x - other.x,
-                            self.y - other.y)
+        cls = other.__class__
+        if cls is Position or cls is tuple:
+            return Position(self[0] - other[0], self[1] - other[1])
+        elif cls is int:
+            return Position(self[0] - other, self[1] - other)
         else:
             raise ValueError
 
-    # def __rsub__(self, other):
-    #     return __sub__(other)
+    def __rsub__(self, other):
+        cls = other.__class__
+        if cls is tuple:
+            return Position(other[0] - self[0], other[1] - self[1])
+        elif cls is int:
+            return Position(other - self[0], other - self[1])
+        else:
+            raise ValueError
 
     def __mul__(self, other):
-        if isinstance(other, tuple):
-            return Position(self.x * other[0],
-                            self.y * other[1])
-        elif isinstance(other, int):
-            return Position(self.x * other,
-                            self.y * other)
-        elif isinstance(other, Position):
-            return Position(self.x * other.x,
-                            self.y * other.y)
+        cls = other.__class__
+        if cls is Position or cls is tuple:
+            return Position(self[0] * other[0], self[1] * other[1])
+        elif cls is int or cls is float:
+            return Position(self[0] * other, self[1] * other)
         else:
             raise ValueError
 
@@ -73,22 +78,24 @@ class Position:
         return self.__mul__(other)
 
     def __truediv__(self, other):
-        if isinstance(other, tuple):
-            return Position(self.x / other[0],
-                            self.y / other[1])
-        elif isinstance(other, int) or isinstance(other, float):
-            return Position(self.x / other,
-                            self.y / other)
-        elif isinstance(other, Position):
-            return Position(self.x / other.x,
-                            self.y / other.y)
+        cls = other.__class__
+        if cls is Position or cls is tuple:
+            return Position(self[0] / other[0], self[1] / other[1])
+        elif cls is int or cls is float:
+            return Position(self[0] / other, self[1] / other)
         else:
             raise ValueError
 
     def norm(self):
-        return math.sqrt(self.x**2 + self.y**2)
+        return math.sqrt(self[0]**2 + self[1]**2)
 
 
+_interned = {}
+
+def intern_positions(positions):
+    ''' make Position(x, y) hand back these exact objects from now on '''
+    for p in positions:
+        _interned[tuple(p)] = Position(*p)
 
 
 # helpers for hex coordinate conversion
@@ -158,13 +165,73 @@ def doublewidth_distance(pos1, pos2):
 
     '''
 
-    # x1, y1 = pos1
-    # x2, y2 = pos2
-    # dx = abs(x1-x2)
-    # dy = abs(y1-y2)
-    dx, dy = map(abs, pos1 - pos2)
+    x1, y1 = pos1
+    x2, y2 = pos2
+    dx = abs(x1-x2)
+    dy = abs(y1-y2)
     return dy + max(0, (dx - dy)//2)
-    
+
+
+class HexGrid:
+    '''
+    precomputed tables for a fixed width x height doublewidth board
+
+    hexes are numbered by their index in self.spaces (row by row);
+    self.distances is the flat all-pairs distance table, so the distance
+    between hex ids i and j is self.distances[i * self.size + j]
+
+    self.rings[i][d] lists the hex ids at distance d from hex i
+    '''
+    NEIGHBORS = [(-2, 0), (-1, 1), (1, 1),
+                 (2, 0), (1, -1), (-1, -1)]
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        intern_positions((x, y) for y in range(height)
+                                for x in range(y%2, width, 2))
+        self.spaces = [Position(x, y) for y in range(height)
+                                      for x in range(y%2, width, 2)]
+        self.hex_id = {pos: i for i, pos in enumerate(self.spaces)}
+        self.size = len(self.spaces)
+
+        self.distances = [doublewidth_distance(a, b)
+                          for a in self.spaces for b in self.spaces]
+
+        self.neighbors = []
+        for x, y in self.spaces:
+            neighbor_ids = []
+            for dx, dy in self.NEIGHBORS:
+                i = self.hex_id.get((x + dx, y + dy))
+                if i is not None:
+                    neighbor_ids.append(i)
+            self.neighbors.append(neighbor_ids)
+
+        self.rings = []
+        for i in range(self.size):
+            row = self.distances[i * self.size:(i+1) * self.size]
+            rings = [[] for _ in range(max(row) + 1)]
+            for j, d in enumerate(row):
+                rings[d].append(j)
+            self.rings.append(rings)
+
+    def id_distance(self, i, j):
+        return self.distances[i * self.size + j]
+
+    def distance(self, pos1, pos2):
+        ''' table lookup, falling back to doublewidth_distance off the board '''
+        i = self.hex_id.get(pos1)
+        j = self.hex_id.get(pos2)
+        if i is None or j is None:
+            return doublewidth_distance(pos1, pos2)
+        return self.distances[i * self.size + j]
+
+
+@lru_cache(maxsize=None)
+def hex_grid(width, height):
+    ''' shared HexGrid per board size, built once per process '''
+    return HexGrid(width, height)
+
 
 
 def euc_dist(coord1, coord2):
@@ -0,0 +1,192 @@
+'''
+per-fight profiling counters
+
+a FightProfiler passed to Board(..., profiler=...) wraps the hot
+methods of that board and of every unit added to it, counting calls
+and accumulating wall time per section:
+
+    targeting       Unit.acquire_target, Board.closest_unit
+    pathing         Board.search_path
+    area_queries    Board.line_trace, circle_range, cone_range
+    damage          Unit.receive_damage, Unit.on_damage
+    spell_casts     Unit.cast_spell (only the time spent running it,
+                    not the time it sleeps on the game clock)
+    projectiles     Board.update_projectiles
+
+the wrappers are instance attributes set at attach time, so a board
+without a profiler runs the plain methods at no extra cost
+
+nested calls within the same section (e.g. acquire_target calling
+closest_unit) are timed once, by the outermost call
+'''
+import functools
+import inspect
+from time import perf_counter
+
+
+SECTIONS = {
+    'targeting': {'board': ['closest_unit'], 'unit': ['acquire_target']},
+    'pathing': {'board': ['search_path'], 'unit': []},
+    'area_queries': {'board': ['line_trace', 'circle_range', 'cone_range'],
+                     'unit': []},
+    'damage': {'board': [], 'unit': ['receive_damage', 'on_damage']},
+    'spell_casts': {'board': [], 'unit': ['cast_spell']},
+    'projectiles': {'board': ['update_projectiles'], 'unit': []},
+}
+
+
+class ProfileSummary:
+    '''
+    {section: [calls, seconds]} for one or more fights; summaries
+    from different fights (or processes) add up with merge()
+    '''
+    def __init__(self, counters=None, fights=1):
+        self.counters = {name: [0, 0.0] for name in SECTIONS}
+        if counters:
+            for name, (calls, seconds) in counters.items():
+                self.counters[name] = [calls, seconds]
+        self.fights = fights
+
+    def merge(self, other):
+        for name, (calls, seconds) in other.counters.items():
+            counter = self.counters.setdefault(name, [0, 0.0])
+            counter[0] += calls
+            counter[1] += seconds
+        self.fights += other.fights
+        return self
+
+    def as_dict(self):
+        return {'fights': self.fights,
+                'sections': {name: {'calls': calls, 'seconds': seconds}
+                             for name, (calls, seconds) in self.counters.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls({name: (s['calls'], s['seconds'])
+                    for name, s in d['sections'].items()}, d['fights'])
+
+    def __str__(self):
+        lines = ['%-14s %10s %10s %12s' % ('section', 'calls', 'ms', 'us/call')]
+        for name, (calls, seconds) in self.counters.items():
+            lines.append('%-14s %10d %10.2f %12.2f' % (
+                name, calls, seconds * 1e3,
+                seconds / calls * 1e6 if calls else 0))
+        lines.append('(%d fights)' % self.fights)
+        return '\n'.join(lines)
+
+
+class _TimedAwaitable:
+    ''' drives a coroutine, timing only the steps it actually runs '''
+    def __init__(self, profiler, section, owner, coro):
+        self.profiler = profiler
+        self.section = section
+        self.owner = owner
+        self.coro = coro
+
+    def __await__(self):
+        profiler, section, owner, coro = (self.profiler, self.section,
+                                          self.owner, self.coro)
+        profiler._count(section)
+        value = None
+        exc = None
+        while True:
+            start = profiler._enter(section, owner)
+            try:
+                if exc is None:
+                    yielded = coro.send(value)
+                else:
+                    yielded = coro.throw(exc)
+            except StopIteration as e:
+                return e.value
+            finally:
+                profiler._exit(section, owner, start)
+
+            try:
+                value = yield yielded
+                exc = None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                value = None
+                exc = e
+
+
+class FightProfiler:
+    '''
+    @on_enter(section, owner) & @on_exit(section, owner, seconds):
+        optional callbacks around every timed call (only the outermost
+        call of nested ones), e.g. to forward to an external profiler
+    '''
+    def __init__(self, on_enter=None, on_exit=None):
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.board = None
+        self.counters = {name: [0, 0.0] for name in SECTIONS}
+        self._depth = dict.fromkeys(SECTIONS, 0)
+        self._instrumented = []  # (obj, method name), for detach
+
+    def attach(self, board):
+        self.board = board
+        for section, methods in SECTIONS.items():
+            for name in methods['board']:
+                self._wrap(board, name, section)
+
+    def instrument_unit(self, unit):
+        ''' called by Board.add_unit '''
+        for section, methods in SECTIONS.items():
+            for name in methods['unit']:
+                self._wrap(unit, name, section)
+
+    def detach(self):
+        ''' put the plain methods back '''
+        for obj, name in self._instrumented:
+            obj.__dict__.pop(name, None)
+        self._instrumented = []
+
+    def summary(self):
+        return ProfileSummary(self.counters)
+
+
+    def _count(self, section):
+        if self._depth[section] == 0:
+            self.counters[section][0] += 1
+
+    def _enter(self, section, owner):
+        depth = self._depth[section]
+        self._depth[section] = depth + 1
+        if depth:
+            return None
+        if self.on_enter:
+            self.on_enter(section, owner)
+        return perf_counter()
+
+    def _exit(self, section, owner, start):
+        self._depth[section] -= 1
+        if start is None:
+            return
+        elapsed = perf_counter() - start
+        self.counters[section][1] += elapsed
+        if self.on_exit:
+            self.on_exit(section, owner, elapsed)
+
+    def _wrap(self, obj, name, section):
+        method = getattr(obj, name)
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed(*args, **kwargs):
+                return await _TimedAwaitable(self, section, obj,
+                                             method(*args, **kwargs))
+        else:
+            @functools.wraps(method)
+            def timed(*args, **kwargs):
+                self._count(section)
+                start = self._enter(section, obj)
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self._exit(section, obj, start)
+
+        setattr(obj, name, timed)
+        self._instrumented.append((obj, name))
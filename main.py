@@ -5,68 +5,34 @@ import json
 
 from champions import Unit
 from board import Board
+from player import Player
+from combat_log import daily_combat_log
 
 
-class Player:
-    # hp, gold, win streak, exp, champion roster
-    # should each player get a single board? with half playable
-    # space and reflect over for battle
-    # each spot points to a champion
-    def __init__(self):
-        self.champions = set()
-        self.level = 1
-        self.exp = 0
-        self.gold = 0
-        self.win_streak = 0
-        self.hp = 100
-
-    def take_damage(self, dmg):
-        self.hp -= dmg
-        print('dmg', dmg, ', remaining hp', self.hp)
-        if self.hp <= 0:
-            ## TODO
-            print('died')
-            pass
-
-
-logfile = open('combat_log_%s' % datetime.datetime.now().strftime('%Y_%m_%d'), 'a')
-logfile.write(str(datetime.datetime.now()))
-logfile.write('\n\n')
-
-
-
-def setup(logfile=None):
+def setup(logger=None):
     p1 = Player()
     p2 = Player()
 
-    p1c0 = Unit.from_name('Blitzcrank', position=(0, 0), 
-                       logfile=logfile)
-    p1c1 = Unit.from_name('Ahri', position=(2, 0), 
-                       logfile=logfile)
-    p1c2 = Unit.from_name('Poppy', position=(3, 3),
-                       logfile=logfile)
+    p1c0 = Unit.from_name('Blitzcrank', position=(0, 0))
+    p1c1 = Unit.from_name('Ahri', position=(2, 0))
+    p1c2 = Unit.from_name('Poppy', position=(3, 3))
 
     p1.champions.add(p1c0)
     p1.champions.add(p1c1)
     p1.champions.add(p1c2)
 
-    p2c0 = Unit.from_name('Annie', position=(1, 1), 
-                       logfile=logfile)
-    #p2c1 = Unit.from_name('Jayce', position=(9, 1), star=2, 
-    #                   logfile=logfile)
-    p2c2 = Unit.from_name('Jayce', position=(1, 3), 
-                       logfile=logfile)
-    # p2c3 = Unit.from_name('Annie', position=(4, 4), 
-    #                    logfile=logfile)
-    p2c4 = Unit.from_name('Jhin', position=(5, 3), 
-                       logfile=logfile)
+    p2c0 = Unit.from_name('Annie', position=(1, 1))
+    #p2c1 = Unit.from_name('Jayce', position=(9, 1), star=2)
+    p2c2 = Unit.from_name('Jayce', position=(1, 3))
+    # p2c3 = Unit.from_name('Annie', position=(4, 4))
+    p2c4 = Unit.from_name('Jhin', position=(5, 3))
     p2.champions.add(p2c0)
     #p2.champions.add(p2c1)
     p2.champions.add(p2c2)
     # p2.champions.add(p2c3)
     p2.champions.add(p2c4)
 
-    board = Board(p1, p2, speed=2)
+    board = Board(p1, p2, speed=2, logger=logger)
 
     print(board.units)
     print([u.__dict__ for u in board.units])
@@ -75,8 +41,11 @@ def setup(logfile=None):
     return board
 
 
-GAME_BOARD = setup(logfile)
+if __name__ == '__main__':
+    logger = daily_combat_log()
+
+    GAME_BOARD = setup(logger)
 
-asyncio.run(GAME_BOARD.start_game())
+    asyncio.run(GAME_BOARD.start_game())
 
-logfile.close()
\ No newline at end of file
+    logger.close()
@@ -0,0 +1,20 @@
+class Player:
+    # hp, gold, win streak, exp, champion roster
+    # should each player get a single board? with half playable
+    # space and reflect over for battle
+    # each spot points to a champion
+    def __init__(self):
+        self.champions = set()
+        self.level = 1
+        self.exp = 0
+        self.gold = 0
+        self.win_streak = 0
+        self.hp = 100
+
+    def take_damage(self, dmg):
+        self.hp -= dmg
+        print('dmg', dmg, ', remaining hp', self.hp)
+        if self.hp <= 0:
+            ## TODO
+            print('died')
+            pass
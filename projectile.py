@@ -1,73 +1,93 @@
-import pygame
 import math
-from hex_utils import euc_dist
 
+SQRT3 = math.sqrt(3)
 
-class Projectile(pygame.sprite.Sprite):
-    def __init__(self, owner, starting_loc, ending_loc,
-                 speed, size=(50, 50), img=None, collision_func=None,
-                 ending_func=None):
+
+class Projectile:
+    '''
+    projectile flying across the board in board coordinates
+
+    positions are doublewidth (col, row) floats; internally rows are
+    scaled by sqrt(3) so the space is euclidean and adjacent hex centers
+    are 2 apart. collisions are swept: an update checks every unit whose
+    hex center came within @hit_radius of the segment travelled since the
+    previous update, so the hits don't depend on how often (or whether)
+    anything renders
+    '''
+    def __init__(self, owner, start, end, speed, hit_radius=1,
+                 collision_func=None, ending_func=None):
         '''
-        @starting_loc, ending_loc: Euclidean coords for display
+        @start, end: board positions
+        @speed: hexes per second of game time
         '''
-        super().__init__()
-
         self.owner = owner
         self.board = owner.board
-        self.ending_loc = ending_loc
+        self.x, self.y = start[0], start[1] * SQRT3
+        self.end_x, self.end_y = end[0], end[1] * SQRT3
         self.speed = speed
+        self.hit_radius = hit_radius
+        self.last_update = self.board.now()
 
-        try:
-            self.img = pygame.image.load(img)
-            self.img = pygame.transform.scale(self.img, size)
-        except Exception as e:
-            print("Error loading img: ", e)
-            self.img = None
-
-        self.surf = pygame.Surface(size)
-        self.surf.fill((255, 255, 255))
-        self.rect = self.surf.get_rect()
-        if self.img:
-            self.surf.blit(self.img, self.rect)
-        
-        self.rect.move_ip(*starting_loc)
         self.atDestination = False
         self.collision_func = collision_func
         self.ending_func = ending_func
         self.collided_targets = set()
 
+    @property
+    def position(self):
+        ''' current doublewidth (col, row), fractional '''
+        return (self.x, self.y / SQRT3)
 
-    def update(self):
-        # move
-        d = math.ceil(euc_dist(self.rect.center, self.ending_loc))
 
-        move_vec = (self.speed*(self.ending_loc[0] - self.rect.x) // d,
-                    self.speed*(self.ending_loc[1] - self.rect.y) // d)
+    def update(self, now):
+        ''' advance to game time @now '''
+        dt = now - self.last_update
+        self.last_update = now
 
+        x0, y0 = self.x, self.y
+        dx = self.end_x - x0
+        dy = self.end_y - y0
+        remaining = math.sqrt(dx*dx + dy*dy)
+        step = 2 * self.speed * dt  # adjacent hexes are 2 apart
 
-        self.rect.move_ip(*move_vec)
+        if step >= remaining:
+            x1, y1 = self.end_x, self.end_y
+            arrived = True
+        else:
+            x1 = x0 + dx * step / remaining
+            y1 = y0 + dy * step / remaining
+            arrived = False
 
-        # check for board collisions
+        # check for board collisions along the way; the board's broadphase
+        # only hands us units in the hexes around this step's path
         if self.collision_func:
-            for unit in self.board.units:
+            for unit in self.board.units_near_segment(x0, y0, x1, y1,
+                                                      self.hit_radius):
                 if unit in self.collided_targets:
                     continue
 
-                # try to collide against image
-                if unit.img_rect is not None:
-                    if self.rect.colliderect(unit.img_rect):
-                        self.collision_func(unit)
-                        self.collided_targets.add(unit)
-                else:
-                    p = self.board.get_hex_center_euc(unit.position)
-                    if self.rect.collidepoint(p):
-                        self.collision_func(unit)
-                        self.collided_targets.add(unit)
+                ux, uy = unit.position
+                if segment_distance(x0, y0, x1, y1, ux, uy * SQRT3) <= self.hit_radius:
+                    self.collision_func(unit)
+                    self.collided_targets.add(unit)
 
+        self.x, self.y = x1, y1
 
-        if self.rect.collidepoint(self.ending_loc):
+        if arrived:
             self.atDestination = True
             if self.ending_func:
                 self.ending_func(self)
-            return
 
+
+def segment_distance(x0, y0, x1, y1, px, py):
+    ''' euclidean distance from point p to the segment (x0, y0)-(x1, y1) '''
+    dx = x1 - x0
+    dy = y1 - y0
+    length_sq = dx*dx + dy*dy
+    if length_sq == 0:
+        t = 0
+    else:
+        t = max(0, min(1, ((px - x0)*dx + (py - y0)*dy) / length_sq))
+    cx = x0 + t*dx - px
+    cy = y0 + t*dy - py
+    return math.sqrt(cx*cx + cy*cy)
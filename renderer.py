@@ -0,0 +1,186 @@
+import sys
+import pygame
+
+from assets import load_image
+
+BLACK = 0, 0, 0
+WHITE = 255, 255, 255
+GREEN = 0, 128, 0
+RED = 128, 0, 0
+BLUE = 0, 0, 128
+DARKBLUE = 0, 0, 255
+
+
+class ProjectileSprite(pygame.sprite.Sprite):
+    ''' draws a projectile.Projectile wherever the simulation put it '''
+    SIZE = (50, 50)
+    _surfaces = {}  # owner name -> shared sprite surface
+
+    def __init__(self, projectile):
+        super().__init__()
+        self.projectile = projectile
+        self.surf = self.surface_for(projectile.owner.name)
+        self.rect = self.surf.get_rect()
+
+    @classmethod
+    def surface_for(cls, name):
+        surf = cls._surfaces.get(name)
+        if surf is None:
+            surf = pygame.Surface(cls.SIZE)
+            surf.fill((255, 255, 255))
+            img = load_image('imgs/%s_ability.png' % name, cls.SIZE)
+            if img:
+                surf.blit(img, (0, 0))
+            cls._surfaces[name] = surf
+        return surf
+
+    def update(self, board):
+        self.rect.center = board.get_hex_center_euc(self.projectile.position)
+
+
+class PygameRenderer:
+    '''
+    draws a Board into a pygame window
+
+    the Board itself never touches pygame; a headless Board simply
+    has no renderer and spends its ticks on simulation only
+
+    the static hex grid is rendered once into self.background, text
+    surfaces are cached by their string, and each frame only restores
+    & redraws the rectangles that were drawn on, then pushes just those
+    to the display
+    '''
+    UNIT_IMG_SIZE = (128, 128)
+    FPS = 60
+    TEXT_CACHE_SIZE = 1024
+
+    def __init__(self, board):
+        pygame.init()
+        self.board = board
+        self.font = pygame.font.SysFont("comicsans", 24)
+
+        _x, _y = board.get_hex_center_euc((board.WIDTH+1, board.HEIGHT))
+        self.screen_size = (int(_x) + board.MARGIN, int(_y) + board.MARGIN)
+        self.screen = pygame.display.set_mode(self.screen_size)
+        self.projectile_sprites = {}  # projectile -> ProjectileSprite
+
+        self.background = pygame.Surface(self.screen_size)
+        self.draw_background(self.background)
+        self._text_cache = {}
+        self._dirty = None  # rects drawn last frame, None forces a full redraw
+
+
+    def load_unit_img(self, unit):
+        unit.img = load_image("imgs/%s.png" % unit.name, self.UNIT_IMG_SIZE)
+        # warm up the ability sprite too, so casting never hits the disk
+        ProjectileSprite.surface_for(unit.name)
+
+
+    def draw_background(self, surface):
+        surface.fill(BLACK)
+
+        for (c, r) in self.board.spaces:
+            pygame.draw.lines(surface, (255, 0, 0), True,
+                              self.board.get_hex_corners_euc((c, r)))
+
+
+    def render_text(self, text, color=BLACK):
+        key = (text, color)
+        surf = self._text_cache.get(key)
+        if surf is None:
+            if len(self._text_cache) >= self.TEXT_CACHE_SIZE:
+                self._text_cache.clear()
+            surf = self._text_cache[key] = self.font.render(text, 1, color)
+        return surf
+
+
+    def draw_unit(self, unit, hp, shield, mana, max_mana):
+        '''
+        draw @unit with its hp & mana bars, returns the area drawn on;
+        the bar values come in from the board's store columns
+        '''
+        screen = self.screen
+        x, y = self.board.get_hex_center_euc(unit.position)
+        rect = unit.img.get_rect()
+        rect.center = x, y
+
+        # align the Surface img to the hex center
+        screen.blit(unit.img, rect)
+
+        width = unit.img.get_width()
+        topleftx = x - width/2
+        toplefty = y - unit.img.get_height()/2
+
+        # draw hp bar, with shield
+        max_hp = unit.max_hp
+        pygame.draw.rect(screen, WHITE,
+                         (topleftx, toplefty - 50, width, 20))
+        pygame.draw.rect(screen, RED,
+                         (topleftx, toplefty - 50,
+                          (max_hp / (max_hp + shield)) * width, 20))
+        pygame.draw.rect(screen, GREEN,
+                         (topleftx, toplefty - 50,
+                          (max(0, hp) / (max_hp + shield)) * width, 20))
+        screen.blit(self.render_text("HP: %d/%d+%d" % (hp, max_hp, shield)),
+                    (topleftx, toplefty - 50))
+
+        # draw mana bar
+        pygame.draw.rect(screen, DARKBLUE,
+                         (topleftx, toplefty - 30, width, 20))
+        pygame.draw.rect(screen, BLUE,
+                         (topleftx, toplefty - 30,
+                         ((mana / max_mana)
+                          if max_mana > 0 else 0) * width, 20))
+        screen.blit(self.render_text("MP: %d/%d" % (mana, max_mana)),
+                    (topleftx, toplefty - 30))
+
+        return rect.union(pygame.Rect(topleftx, toplefty - 50, width, 40))
+
+
+    def draw(self):
+        board = self.board
+        screen = self.screen
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: sys.exit()
+
+        # wipe whatever we drew last frame
+        if self._dirty is None:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self._dirty:
+                screen.blit(self.background, rect, rect)
+
+        drawn = []
+        store = board.store
+        slots = store.alive_slots()
+        for unit, hp, shield, mana, max_mana in zip(
+                store.units_at(slots), store.hp[slots].tolist(),
+                store.shield[slots].tolist(), store.mana[slots].tolist(),
+                store.max_mana[slots].tolist()):
+            if unit.img:
+                drawn.append(self.draw_unit(unit, hp, shield, mana, max_mana))
+
+
+        projectiles = board.get_projectiles()
+        for p in list(self.projectile_sprites):
+            if p not in projectiles:
+                del self.projectile_sprites[p]
+
+        for p in projectiles:
+            sprite = self.projectile_sprites.get(p)
+            if sprite is None:
+                sprite = self.projectile_sprites[p] = ProjectileSprite(p)
+            sprite.update(board)
+            drawn.append(screen.blit(sprite.surf, sprite.rect))
+
+
+        if not board.isGameActive:
+            drawn.append(screen.blit(self.render_text("Round over", WHITE),
+                                     (300, 300)))
+
+
+        if self._dirty is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._dirty + drawn)
+        self._dirty = drawn
@@ -0,0 +1,280 @@
+'''
+compact binary fight replays
+
+a replay is a little-endian stream of event records, each a u8 event
+type and an f32 game time followed by a fixed payload:
+
+    SPAWN       unit id, team, star, x, y, hp, max_hp, mana, max_mana, name
+    MOVE        unit id, x, y
+    DAMAGE      unit id, source id, dmg type, dmg, hp, shield, mana after
+    CAST        unit id
+    PROJECTILE  owner id, start x, y, end x, y, speed (board coordinates)
+    DEATH       unit id
+    KEYFRAME    full state of every unit still on the board
+    MANA        unit id, mana after (mana from attacks; casts & hits
+                taken are covered by CAST & DAMAGE)
+    SHIELD      unit id, total shield after a shield goes up or runs out
+
+keyframes are written periodically; a footer indexes them by time so
+ReplayPlayer can seek to the nearest one and only apply the events
+after it, instead of re-simulating the fight
+'''
+import bisect
+import struct
+
+MAGIC = b'TFTR'
+INDEX_MAGIC = b'TFTI'
+VERSION = 2  # 2 added MANA & SHIELD, version 1 files still read fine
+
+SPAWN = 1
+MOVE = 2
+DAMAGE = 3
+CAST = 4
+PROJECTILE = 5
+DEATH = 6
+KEYFRAME = 7
+MANA = 8
+SHIELD = 9
+
+NO_UNIT = 0xFFFF
+DMG_TYPES = ['physical', 'magical', 'true']
+
+_header = struct.Struct('<4sHf')
+_event = struct.Struct('<Bf')
+_spawn = struct.Struct('<HBBbbffffB')
+_move = struct.Struct('<Hbb')
+_damage = struct.Struct('<HHBffff')
+_unit_id = struct.Struct('<H')
+_unit_value = struct.Struct('<Hf')
+_projectile = struct.Struct('<Hfffff')
+_count = struct.Struct('<H')
+_keyframe_unit = struct.Struct('<HBBbbfffffB')
+_index_entry = struct.Struct('<fI')
+_footer = struct.Struct('<II4s')
+
+
+def _pack_name(name):
+    name = name.encode('utf-8')
+    return bytes([len(name)]) + name
+
+
+class ReplayRecorder:
+    '''
+    records a Board's events into @fileobj (opened in binary mode)
+
+    pass it to Board(..., recorder=...); the board calls finish()
+    once the round is resolved, which writes the keyframe index
+    '''
+    def __init__(self, fileobj, keyframe_interval=1.0):
+        self.fileobj = fileobj
+        self.keyframe_interval = keyframe_interval
+        self.board = None
+        self._offset = 0
+        self._next_keyframe = 0
+        self._keyframes = []  # (time, offset)
+        self._write(_header.pack(MAGIC, VERSION, keyframe_interval))
+
+    def attach(self, board):
+        self.board = board
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self._offset += len(data)
+
+    def _event(self, event_type, payload, check_keyframe=True):
+        t = self.board.now()
+        if check_keyframe and t >= self._next_keyframe:
+            self.keyframe()
+        self._write(_event.pack(event_type, t) + payload)
+
+    def keyframe(self):
+        t = self.board.now()
+        self._keyframes.append((t, self._offset))
+        self._next_keyframe = t + self.keyframe_interval
+
+        units = sorted(self.board.units, key=lambda u: u._id)
+        chunks = [_event.pack(KEYFRAME, t), _count.pack(len(units))]
+        for unit in units:
+            x, y = unit.position
+            name = unit.name.encode('utf-8')
+            chunks.append(_keyframe_unit.pack(
+                unit._id, unit.team_id, unit.star, x, y,
+                unit.hp, unit.max_hp, unit.mana, unit.max_mana,
+                unit.total_shield, len(name)))
+            chunks.append(name)
+        self._write(b''.join(chunks))
+
+    ''' hooks called by Board & Unit '''
+    def spawn(self, unit):
+        x, y = unit.position
+        name = unit.name.encode('utf-8')
+        self._event(SPAWN, _spawn.pack(
+            unit._id, unit.team_id, unit.star, x, y, unit.hp, unit.max_hp,
+            unit.mana, unit.max_mana, len(name)) + name,
+            check_keyframe=False)
+
+    def move(self, unit):
+        x, y = unit.position
+        self._event(MOVE, _move.pack(unit._id, x, y))
+
+    def damage(self, unit, source, dmg_type, dmg):
+        source_id = NO_UNIT
+        if source is not None and source._id is not None:
+            source_id = source._id
+        self._event(DAMAGE, _damage.pack(
+            unit._id, source_id, DMG_TYPES.index(dmg_type), dmg,
+            unit.hp, unit.total_shield, unit.mana))
+
+    def cast(self, unit):
+        self._event(CAST, _unit_id.pack(unit._id))
+
+    def projectile(self, owner, start, end, speed):
+        self._event(PROJECTILE, _projectile.pack(
+            owner._id, start[0], start[1], end[0], end[1], speed))
+
+    def death(self, unit):
+        self._event(DEATH, _unit_id.pack(unit._id))
+
+    def mana(self, unit):
+        self._event(MANA, _unit_value.pack(unit._id, unit.mana))
+
+    def shield(self, unit):
+        self._event(SHIELD, _unit_value.pack(unit._id, unit.total_shield))
+
+    def finish(self):
+        index_offset = self._offset
+        for entry in self._keyframes:
+            self._write(_index_entry.pack(*entry))
+        self._write(_footer.pack(index_offset, len(self._keyframes),
+                                 INDEX_MAGIC))
+        self.fileobj.flush()
+
+
+class ReplayPlayer:
+    '''
+    reads a recorded replay; state_at(t) seeks to the nearest keyframe
+    at or before t and applies the events after it
+    '''
+    def __init__(self, data):
+        if isinstance(data, str):
+            with open(data, 'rb') as f:
+                data = f.read()
+        self.data = data
+
+        magic, version, self.keyframe_interval = _header.unpack_from(data, 0)
+        if magic != MAGIC or not 1 <= version <= VERSION:
+            raise ValueError('not a replay file')
+
+        index_offset, n_keyframes, index_magic = _footer.unpack_from(
+            data, len(data) - _footer.size)
+        if index_magic != INDEX_MAGIC:
+            raise ValueError('replay is missing its keyframe index')
+
+        self._events_end = index_offset
+        self.keyframes = [_index_entry.unpack_from(data, index_offset + i * _index_entry.size)
+                          for i in range(n_keyframes)]
+        self._keyframe_times = [t for t, _ in self.keyframes]
+
+    def events(self, offset=None):
+        ''' yields (event type, time, fields) from @offset onwards '''
+        data = self.data
+        offset = _header.size if offset is None else offset
+        while offset < self._events_end:
+            event_type, t = _event.unpack_from(data, offset)
+            offset += _event.size
+            if event_type == SPAWN:
+                fields = _spawn.unpack_from(data, offset)
+                offset += _spawn.size
+                name_len = fields[-1]
+                name = data[offset:offset + name_len].decode('utf-8')
+                offset += name_len
+                fields = fields[:-1] + (name,)
+            elif event_type == MOVE:
+                fields = _move.unpack_from(data, offset)
+                offset += _move.size
+            elif event_type == DAMAGE:
+                fields = _damage.unpack_from(data, offset)
+                offset += _damage.size
+            elif event_type in (CAST, DEATH):
+                fields = _unit_id.unpack_from(data, offset)
+                offset += _unit_id.size
+            elif event_type == PROJECTILE:
+                fields = _projectile.unpack_from(data, offset)
+                offset += _projectile.size
+            elif event_type in (MANA, SHIELD):
+                fields = _unit_value.unpack_from(data, offset)
+                offset += _unit_value.size
+            elif event_type == KEYFRAME:
+                count, = _count.unpack_from(data, offset)
+                offset += _count.size
+                units = []
+                for _ in range(count):
+                    unit = _keyframe_unit.unpack_from(data, offset)
+                    offset += _keyframe_unit.size
+                    name_len = unit[-1]
+                    name = data[offset:offset + name_len].decode('utf-8')
+                    offset += name_len
+                    units.append(unit[:-1] + (name,))
+                fields = units
+            else:
+                raise ValueError('unknown replay event %d' % event_type)
+
+            yield event_type, t, fields
+
+    @property
+    def duration(self):
+        t = 0
+        for _, t, _ in self.events():
+            pass
+        return t
+
+    def state_at(self, t):
+        '''
+        {unit id: unit state dict} at game time @t; projectiles holds
+        the projectile launches since the keyframe we started from
+        '''
+        i = bisect.bisect_right(self._keyframe_times, t) - 1
+        offset = self.keyframes[i][1] if i >= 0 else None
+
+        units = {}
+        projectiles = []
+        for event_type, event_t, fields in self.events(offset):
+            if event_t > t:
+                break
+
+            if event_type == KEYFRAME:
+                units = {}
+                projectiles = []
+                for (_id, team, star, x, y, hp, max_hp, mana, max_mana,
+                     shield, name) in fields:
+                    units[_id] = {'name': name, 'team': team, 'star': star,
+                                  'position': (x, y), 'hp': hp,
+                                  'max_hp': max_hp, 'mana': mana,
+                                  'max_mana': max_mana, 'shield': shield,
+                                  'alive': True}
+            elif event_type == SPAWN:
+                _id, team, star, x, y, hp, max_hp, mana, max_mana, name = fields
+                units[_id] = {'name': name, 'team': team, 'star': star,
+                              'position': (x, y), 'hp': hp, 'max_hp': max_hp,
+                              'mana': mana, 'max_mana': max_mana,
+                              'shield': 0, 'alive': True}
+            elif event_type == MOVE:
+                _id, x, y = fields
+                units[_id]['position'] = (x, y)
+            elif event_type == DAMAGE:
+                _id, source_id, dmg_type, dmg, hp, shield, mana = fields
+                units[_id].update(hp=hp, shield=shield, mana=mana)
+            elif event_type == CAST:
+                units[fields[0]]['mana'] = 0
+            elif event_type == DEATH:
+                units[fields[0]]['alive'] = False
+            elif event_type == PROJECTILE:
+                projectiles.append((event_t,) + fields)
+            elif event_type in (MANA, SHIELD):
+                # shields of a unit that just died can run out after the
+                # next keyframe dropped it
+                _id, value = fields
+                if _id in units:
+                    units[_id]['mana' if event_type == MANA else 'shield'] = value
+
+        return {'time': t, 'units': units, 'projectiles': projectiles}
@@ -0,0 +1,150 @@
+'''
+batch fight runner
+
+team specs are lists of (champion name, star, position) tuples,
+positions as main.setup uses them (each player sees its own half
+from the bottom-left), e.g.
+
+    [('Blitzcrank', 1, (0, 0)), ('Ahri', 1, (2, 0))]
+
+fights run headless on the simulated clock, fanned out over a
+process pool
+'''
+import contextlib
+import os
+from collections import namedtuple
+from multiprocessing import Pool
+
+from board import Board
+from champions import Unit
+from combat_log import CombatLogger, OFF
+from estimator import estimate
+from instrumentation import FightProfiler, ProfileSummary
+from player import Player
+from replay import ReplayRecorder
+from sim_clock import run_simulated
+
+
+FightResult = namedtuple('FightResult',
+                         ['index', 'winner', 'survivors', 'damage', 'profile'],
+                         defaults=(None,))
+''' winner is a team id or None for a draw, survivors a tuple of
+    (team id, name, star, hp), damage the player damage per team,
+    profile an instrumentation.ProfileSummary if profiling was on '''
+
+
+def make_player(team):
+    player = Player()
+    for name, star, position in team:
+        player.champions.add(Unit.from_name(name, star=star,
+                                            position=position))
+    return player
+
+
+def run_fight(team1, team2, index=0, timeout=45, replay_dir=None,
+              profile=False):
+    '''
+    simulate a single fight in this process
+
+    @replay_dir: if given, record the fight to <replay_dir>/fight_<index>.replay
+    @profile: if True, count calls & time in the hot paths
+    '''
+    replay_file = None
+    recorder = None
+    if replay_dir is not None:
+        replay_file = open(os.path.join(replay_dir, 'fight_%d.replay' % index), 'wb')
+        recorder = ReplayRecorder(replay_file)
+
+    profiler = FightProfiler() if profile else None
+    board = Board(make_player(team1), make_player(team2), headless=True,
+                  logger=CombatLogger(level=OFF), recorder=recorder,
+                  profiler=profiler)
+    try:
+        run_simulated(board.start_game(timeout=timeout))
+    finally:
+        if replay_file:
+            replay_file.close()
+
+    survivors = tuple((unit.team_id, unit.name, unit.star, int(unit.hp))
+                      for unit in sorted(board.units, key=lambda u: u._id))
+    return FightResult(index, board.winner, survivors, tuple(board.damage),
+                       profiler.summary() if profiler else None)
+
+
+def _run_fight_job(args):
+    # workers don't need the per-event chatter on stdout
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        return run_fight(*args)
+
+
+def iter_fights(team1, team2, n, processes=None, chunksize=1, timeout=45,
+                replay_dir=None, profile=False):
+    '''
+    run @n fights across a process pool (all cores by default),
+    yielding FightResults as they complete, in no particular order
+    '''
+    jobs = ((team1, team2, i, timeout, replay_dir, profile) for i in range(n))
+    with Pool(processes) as pool:
+        for result in pool.imap_unordered(_run_fight_job, jobs, chunksize):
+            yield result
+
+
+def win_rates(team1, team2, n, skip_margin=None, **kwargs):
+    '''
+    aggregate iter_fights into win rates & average player damage
+
+    @skip_margin: if the closed-form estimate (see estimator) calls the
+        matchup with at least this margin, don't simulate at all; the
+        result then has fights == 0 and the estimate under 'estimate'
+    '''
+    if skip_margin is not None:
+        guess = estimate(team1, team2, timeout=kwargs.get('timeout', 45))
+        if guess.winner is not None and guess.margin >= skip_margin:
+            return {
+                'fights': 0,
+                'wins': [0, 0],
+                'draws': 0,
+                'win_rate': [1.0 if t == guess.winner else 0.0 for t in (0, 1)],
+                'avg_damage': None,
+                'profile': None,
+                'estimate': guess,
+            }
+
+    wins = [0, 0]
+    draws = 0
+    total_damage = [0, 0]
+    profile = None
+    fights = 0
+    results = iter_fights(team1, team2, n, **kwargs) if n > 0 else ()
+    for result in results:
+        fights += 1
+        if result.winner is None:
+            draws += 1
+        else:
+            wins[result.winner] += 1
+        for team_id in range(2):
+            total_damage[team_id] += result.damage[team_id]
+        if result.profile is not None:
+            if profile is None:
+                profile = ProfileSummary(fights=0)
+            profile.merge(result.profile)
+
+    # rates are over the fights that actually ran, none for n <= 0
+    return {
+        'fights': fights,
+        'wins': wins,
+        'draws': draws,
+        'win_rate': [w / fights if fights else 0.0 for w in wins],
+        'avg_damage': [d / fights if fights else 0.0 for d in total_damage],
+        'profile': profile,
+        'estimate': None,
+    }
+
+
+if __name__ == '__main__':
+    TEAM_1 = [('Blitzcrank', 1, (0, 0)), ('Ahri', 1, (2, 0)),
+              ('Poppy', 1, (3, 3))]
+    TEAM_2 = [('Annie', 1, (1, 1)), ('Jayce', 1, (1, 3)),
+              ('Jhin', 1, (5, 3))]
+    print(win_rates(TEAM_1, TEAM_2, 100))
@@ -0,0 +1,65 @@
+import asyncio
+import selectors
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    '''
+    selector that never blocks on a timer
+
+    asyncio asks the selector to wait until the earliest scheduled
+    wake-up; instead of sleeping we jump the loop's clock forward
+    '''
+    def __init__(self, loop):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None:
+            # nothing scheduled, only real I/O can wake us up
+            return super().select(None)
+
+        events = super().select(0)
+        if not events and timeout > 0:
+            self._loop.advance(timeout)
+        return events
+
+
+class SimulatedEventLoop(asyncio.SelectorEventLoop):
+    '''
+    asyncio event loop running on a virtual clock
+
+    every asyncio.sleep, call_later and wait_for timeout lands in the
+    loop's priority queue of wake-ups (a heap ordered by wake-up time);
+    whenever the loop is otherwise idle the clock jumps straight to the
+    next wake-up, so a fight runs as fast as the CPU can process its
+    events and wake-ups fire in the same order on every run
+    '''
+    def __init__(self):
+        self._virtual_time = 0.0
+        super().__init__(selector=_VirtualTimeSelector(self))
+
+    def time(self):
+        return self._virtual_time
+
+    def advance(self, seconds):
+        self._virtual_time += seconds
+
+
+def run_simulated(coro):
+    ''' like asyncio.run, but on a fresh SimulatedEventLoop '''
+    loop = SimulatedEventLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            # clean up leftover tasks the same way asyncio.run does
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
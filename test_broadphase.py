@@ -0,0 +1,47 @@
+'''
+Board.units_near_segment (the projectile broadphase) against checking
+every unit with segment_distance
+'''
+import random
+
+from board import Board, SQRT3
+from projectile import segment_distance
+
+
+SEGMENTS = 20000
+
+
+def _random_point(rng):
+    # a little past the edges, projectiles end up there too
+    return (rng.uniform(-2, Board.WIDTH + 2),
+            rng.uniform(-2, (Board.HEIGHT + 1) * SQRT3))
+
+
+def test_units_near_segment_matches_brute_force(random_board):
+    rng = random.Random(0)
+    boards = [random_board((rng.randint(1, 8), rng.randint(1, 8)), seed)
+              for seed in range(20)]
+
+    for i in range(SEGMENTS):
+        board = boards[i % len(boards)]
+        x0, y0 = _random_point(rng)
+        if i % 10 == 0:
+            # zero length, a projectile that hasn't moved yet
+            x1, y1 = x0, y0
+        elif i % 3 == 0:
+            # short hops, like one projectile tick
+            x1, y1 = x0 + rng.uniform(-1, 1), y0 + rng.uniform(-1, 1)
+        else:
+            x1, y1 = _random_point(rng)
+        radius = rng.choice([0.25, 0.5, 1, 1.5, 2])
+
+        def hit(unit):
+            ux, uy = unit.position
+            return segment_distance(x0, y0, x1, y1, ux, uy * SQRT3) <= radius
+
+        expected = {unit for unit in board.units if hit(unit)}
+        near = board.units_near_segment(x0, y0, x1, y1, radius)
+
+        assert len(near) == len(set(near))
+        assert {unit for unit in near if hit(unit)} == expected, \
+            (x0, y0, x1, y1, radius)
@@ -0,0 +1,42 @@
+'''
+the same fights run in separate processes have to come out the same;
+memory addresses (and so set & id() order) differ between processes
+'''
+import subprocess
+import sys
+
+
+FIGHTS = '''
+import contextlib, os, random
+from benchmark import COMPOSITIONS
+from conftest import CHAMPIONS
+from runner import run_fight
+
+rng = random.Random(0)
+matchups = list(COMPOSITIONS.values())
+for _ in range(150):
+    teams = []
+    for _ in range(2):
+        spots = rng.sample([(x, y) for y in range(3)
+                            for x in range(y % 2, 13, 2)], rng.randint(2, 7))
+        teams.append([(rng.choice(CHAMPIONS), rng.randint(1, 2), spot)
+                      for spot in spots])
+    matchups.append(tuple(teams))
+
+results = []
+with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    for i, (team1, team2) in enumerate(matchups):
+        results.append(run_fight(team1, team2, index=i))
+print(repr(results))
+'''
+
+
+def _run():
+    return subprocess.run([sys.executable, '-c', FIGHTS], check=True,
+                          timeout=300, capture_output=True, text=True).stdout
+
+
+def test_fights_match_across_processes():
+    first = _run()
+    assert first
+    assert _run() == first
@@ -0,0 +1,36 @@
+'''
+EffectScheduler on the simulated clock
+'''
+import subprocess
+import sys
+
+import pytest
+
+
+FIGHT = '''
+import sys
+from board import Board
+from combat_log import CombatLogger, OFF
+from effects import DamageOverTime
+from runner import make_player
+from sim_clock import run_simulated
+
+board = Board(make_player([('Poppy', 1, (1, 1))]),
+              make_player([('Annie', 1, (3, 1))]),
+              speed=float(sys.argv[1]), headless=True,
+              logger=CombatLogger(level=OFF))
+poppy = min(board.teams[0], key=lambda u: u._id)
+board.effects.add(DamageOverTime(poppy, 5, 3, interval=0.1))
+run_simulated(board.start_game())
+assert board.winner is not None and not poppy.effects
+'''
+
+
+@pytest.mark.parametrize('speed', [1, 3, 0.7])
+def test_fast_ticking_effect_finishes(speed):
+    # at speeds that aren't powers of two board.now() can come out an ulp
+    # before the deadline the scheduler armed for; that used to leave the
+    # tick on the heap and spin the loop forever without advancing time.
+    # run in a subprocess so a hang is a timeout, not a stuck test run
+    subprocess.run([sys.executable, '-c', FIGHT, str(speed)],
+                   check=True, timeout=60, stdout=subprocess.DEVNULL)
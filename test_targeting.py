@@ -0,0 +1,55 @@
+'''
+Board.closest_unit (per-team index & hex rings) against the plain scan
+over every unit it falls back to
+'''
+import pytest
+
+from board import Board
+
+
+FILTERS = ['enemy', 'ally', 'all']
+
+
+def _check_board(board):
+    for unit in sorted(board.units, key=lambda u: u._id):
+        for filter_func in FILTERS:
+            for farthest in (False, True):
+                assert (board.closest_unit(unit, filter_func, farthest)
+                        is board._closest_unit_scan(unit, filter_func,
+                                                    farthest)), \
+                    (unit, filter_func, farthest)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_closest_unit_matches_scan(random_board, seed):
+    # team sizes on both sides of TARGET_SCAN_LIMIT, so both the direct
+    # check and the ring walk get used
+    sizes = (seed % 9, (seed * 7) % 9)
+    _check_board(random_board(sizes, seed))
+
+
+def test_closest_unit_past_scan_limit(random_board):
+    limit = Board.TARGET_SCAN_LIMIT
+    for seed in range(10):
+        board = random_board((limit + 1, limit + 1 + seed), seed)
+        assert len(board.teams[1]) > limit
+        _check_board(board)
+
+
+def test_closest_unit_ties(random_board):
+    # every hex taken, so each ring has several units at the same distance
+    board = random_board((16, 17), seed=0)
+    assert len(board.units) == len(board.spaces)
+    _check_board(board)
+
+    center = board.get_unit_at_pos((6, 2))
+    ring = [u for u in board.units
+            if board.unit_distance(center, u) == 1]
+    assert board.closest_unit(center, 'all') is min(ring, key=lambda u: u._id)
+
+
+def test_closest_unit_off_grid_fallback(random_board):
+    for seed in range(10):
+        board = random_board((3, 6), seed, offgrid=2)
+        assert any(unit.hex_id is None for unit in board.units)
+        _check_board(board)
@@ -0,0 +1,86 @@
+'''
+struct-of-arrays storage for per-unit fight state
+
+a UnitStore holds one NumPy column per field (hp, mana, position, ...)
+with a row ("slot") per unit; Unit's hp/mana/... properties read and
+write their unit's row. Board.unit_arrays (and through it the area
+queries) and the renderer's hp/mana bars read whole columns; the rest
+of the fight still goes unit by unit
+
+a unit off the board keeps these in plain attributes (_hp, _mana, ...);
+Board.add_unit moves it into the board's store, where it keeps its slot
+for the rest of the fight (dead units just get alive = False)
+'''
+import numpy as np
+
+
+class UnitStore:
+    COLUMNS = {
+        'hp': np.float64,
+        'shield': np.float64,
+        'mana': np.float64,
+        'max_mana': np.float64,
+        'x': np.int64,
+        'y': np.int64,
+        'team': np.int8,
+        'alive': np.bool_,
+    }
+
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.size = 0
+        self.units = []  # slot -> Unit
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, unit, team=-1):
+        '''
+        give @unit a slot here, carrying over its current row from
+        whatever store it was in before, or its plain attributes
+        '''
+        if self.size == self.capacity:
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.units.append(unit)
+
+        old = unit._store
+        if old is not None:
+            old_slot = unit._slot
+            for name in self.COLUMNS:
+                getattr(self, name)[slot] = getattr(old, name)[old_slot]
+        else:
+            self.hp[slot] = unit._hp
+            self.shield[slot] = unit._shield
+            self.mana[slot] = unit._mana
+            self.max_mana[slot] = unit._max_mana
+            self.x[slot], self.y[slot] = unit.position
+        self.team[slot] = team
+        self.alive[slot] = True
+
+        unit._store = self
+        unit._slot = slot
+        return slot
+
+    def alive_slots(self, team=None):
+        ''' slots of the living units, optionally just those of @team '''
+        mask = self.alive[:self.size]
+        if team is not None:
+            mask = mask & (self.team[:self.size] == team)
+        return np.flatnonzero(mask)
+
+    def positions(self, slots):
+        ''' (len(slots), 2) array of the units' (x, y) '''
+        return np.column_stack((self.x[slots], self.y[slots]))
+
+    def units_at(self, slots):
+        units = self.units
+        return [units[i] for i in slots]